@@ -2,41 +2,80 @@ from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain.prompts import ChatPromptTemplate
-from weather_tools import get_current_weather
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from concurrent_executor import ConcurrentAgentExecutor
+from fast_router import FastRouter
+from response_cache import get_response_cache
+from date_context import render_date_context
+from tool_selector import estimate_tokens, get_tool_selector, selected_tool_names
+from calendar_store import LOCAL_TZ, calendar_data_version
+from google_auth import current_user_id
+from weather_tools import get_current_weather, get_weather_for_locations
 from calendar_tools import (
     list_upcoming_events,
     create_calendar_event,
+    create_calendar_events_bulk,
     delete_calendar_event,
+    delete_calendar_events_bulk,
     search_calendar_events,
     get_events_by_date,
+    get_events_in_range,
+    find_free_slots,
     get_tomorrow_events,
     get_today_events,
     get_current_datetime,
     get_today_info
 )
+import asyncio
+import contextvars
+import json
 import os
+import threading
+import time
+from datetime import datetime
+from queue import Queue
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def create_agent(model_choice: str = "gpt", enable_calendar: bool = False):
-    """
-    Tạo và trả về AI agent với model và tools được chọn
-    
-    Args:
-        model_choice (str): "gpt" hoặc "gemini"
-        enable_calendar (bool): Có bật tính năng calendar không
-        
-    Returns:
-        AgentExecutor: Agent executor object
-    """
-    
-    # Initialize the LLM based on choice
-    if model_choice.lower() == "gemini":
+# Tool đọc dữ liệu lịch: câu trả lời dùng chúng được cache kèm phiên bản dữ liệu lịch
+CALENDAR_READ_TOOLS = frozenset(tool.name for tool in (
+    list_upcoming_events,
+    search_calendar_events,
+    get_events_by_date,
+    get_events_in_range,
+    find_free_slots,
+    get_tomorrow_events,
+    get_today_events
+))
+# Tool ghi dữ liệu lịch: không dừng được khi đã chạy nên không giới hạn thời gian
+CALENDAR_WRITE_TOOLS = frozenset(tool.name for tool in (
+    create_calendar_event,
+    create_calendar_events_bulk,
+    delete_calendar_event,
+    delete_calendar_events_bulk
+))
+
+# (model, enable_calendar, nhóm tool) -> (agent, tools, router) dùng chung cho mọi session
+_agent_registry = {}
+# Cùng khóa -> số token của system prompt và schema các tool
+_agent_prompt_tokens = {}
+_agent_registry_lock = threading.Lock()
+_agent_registry_stats = {'builds': 0, 'hits': 0, 'build_seconds': 0.0}
+# Số lượt agent chạy (qua LLM), tổng số vòng gọi LLM và số lần gọi tool ngày giờ
+_iteration_stats = {'runs': 0, 'iterations': 0, 'datetime_tool_calls': 0}
+_iteration_stats_lock = threading.Lock()
+# model -> LLM client dùng chung cho mọi biến thể agent (mọi nhóm tool) của model đó
+_llms = {}
+_llm_lock = threading.Lock()
+
+def _create_llm(model_choice: str):
+    """Khởi tạo LLM client theo model được chọn."""
+    if model_choice == "gemini":
         if not os.getenv('GOOGLE_API_KEY'):
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        llm = ChatGoogleGenerativeAI(
+        return ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             temperature=0,
             google_api_key=os.getenv('GOOGLE_API_KEY')
@@ -44,73 +83,116 @@ def create_agent(model_choice: str = "gpt", enable_calendar: bool = False):
     else:  # Default to GPT
         if not os.getenv('OPENAI_API_KEY'):
             raise ValueError("OPENAI_API_KEY not found in environment variables")
-        llm = ChatOpenAI(
+        return ChatOpenAI(
             model="gpt-4o",
             temperature=0
         )
+
+def _get_llm(model_choice: str):
+    """LLM client dùng chung trong process cho model được chọn (tạo ở lần gọi đầu)."""
+    with _llm_lock:
+        llm = _llms.get(model_choice)
+        if llm is None:
+            llm = _llms[model_choice] = _create_llm(model_choice)
+        return llm
+
+def _build_agent(model_choice: str, enable_calendar: bool, groups=None):
+    """
+    Tạo LLM, danh sách tools, system prompt và agent runnable.
+    Các đối tượng này không giữ trạng thái của session nên dùng chung được.
+    
+    Args:
+        groups (tuple | None): Chỉ gắn tools (và phần prompt) của các nhóm này
+            (xem tool_selector.TOOL_GROUPS); None để gắn đầy đủ
+    
+    Returns:
+        tuple: (agent, tools, số token của system prompt và schema tools)
+    """
+    llm = _get_llm(model_choice)
     
     # Define tools based on enabled features
-    tools = [get_current_weather, get_current_datetime, get_today_info]
+    tools = [get_current_weather, get_weather_for_locations, get_current_datetime, get_today_info]
     
     if enable_calendar:
-        try:
-            # Test calendar connection
-            from google_auth import get_calendar_service
-            get_calendar_service()
-            tools.extend([
-                list_upcoming_events,
-                create_calendar_event,
-                delete_calendar_event,
-                search_calendar_events,
-                get_events_by_date,
-                get_tomorrow_events,
-                get_today_events
-            ])
-        except Exception as e:
-            raise Exception(f"Lỗi kết nối Google Calendar: {str(e)}")
+        tools.extend([
+            list_upcoming_events,
+            create_calendar_event,
+            create_calendar_events_bulk,
+            delete_calendar_event,
+            delete_calendar_events_bulk,
+            search_calendar_events,
+            get_events_by_date,
+            get_events_in_range,
+            find_free_slots,
+            get_tomorrow_events,
+            get_today_events
+        ])
+    if groups is not None:
+        names = set(selected_tool_names(groups))
+        tools = [tool for tool in tools if tool.name in names]
+    tool_names = {tool.name for tool in tools}
     
     # Create system prompt
-    calendar_features = """
+    weather_features = """
+    
+    🌤️ **Tính năng Weather (luôn có sẵn):**
+    - Kiểm tra thời tiết hiện tại của bất kỳ thành phố nào trên thế giới
+    - Hiển thị nhiệt độ, độ ẩm, tốc độ gió và mô tả thời tiết
+    - Nhiều thành phố cùng lúc: gọi `get_weather_for_locations()` một lần với danh sách địa điểm""" if 'get_current_weather' in tool_names else ""
+    
+    calendar_write_features = """
+    - Tạo sự kiện mới: `create_calendar_event()`
+    - Xóa sự kiện: `delete_calendar_event()`
+    - Tạo/xóa nhiều sự kiện một lần: `create_calendar_events_bulk()`, `delete_calendar_events_bulk()`
+      (dùng thay vì gọi create/delete nhiều lần, ví dụ chuỗi buổi học hoặc dọn lịch cả tuần)""" if 'create_calendar_event' in tool_names else ""
+    
+    calendar_features = f"""
     
     📅 **Tính năng Calendar (đã kích hoạt):**
     - Xem danh sách sự kiện sắp tới: `list_upcoming_events()`
     - Xem sự kiện theo ngày cụ thể: `get_events_by_date(date)` 
-    - Tạo sự kiện mới: `create_calendar_event()`
-    - Xóa sự kiện: `delete_calendar_event()`
+    - Xem sự kiện trong khoảng ngày: `get_events_in_range(start_date, end_date)`
+    - Tìm thời gian rảnh: `find_free_slots(date, duration_minutes, start_time, end_time)`
+      ("chiều mai rảnh lúc nào?" → start_time='13:00', end_time='18:00'; không cần liệt kê sự kiện trước){calendar_write_features}
     - Tìm kiếm sự kiện: `search_calendar_events()`
     
     **Xử lý yêu cầu theo ngày:**
     - "ngày mai", "tomorrow" → tính toán ngày tiếp theo và dùng get_events_by_date()
     - "ngày 30/6/2025", "2025-06-30" → dùng get_events_by_date() với ngày cụ thể
-    - "tuần này", "tháng này" → dùng list_upcoming_events() với số lượng phù hợp
+    - "tuần này", "tháng này" → tính ngày đầu/cuối của tuần/tháng và dùng get_events_in_range()
+    
+    **Nhiều calendar:** mặc định chỉ xem calendar chính; khi user hỏi về lịch công việc, nhóm,
+    lịch được chia sẻ hoặc "tất cả các lịch" → truyền `all_calendars=True` cho các tool xem lịch
     
     **Định dạng ngày hỗ trợ:**
     - 'YYYY-MM-DD' (ví dụ: '2025-06-30')  
     - 'DD/MM/YYYY' (ví dụ: '30/06/2025')
     - Múi giờ mặc định: Asia/Ho_Chi_Minh (UTC+7)
-    """ if enable_calendar else ""
+    """ if 'list_upcoming_events' in tool_names else ""
     
     system_prompt = f"""
-    Bạn là một trợ lý AI thông minh và hiệu quả với các tính năng sau:
-    
-    🌤️ **Tính năng Weather (luôn có sẵn):**
-    - Kiểm tra thời tiết hiện tại của bất kỳ thành phố nào trên thế giới
-    - Hiển thị nhiệt độ, độ ẩm, tốc độ gió và mô tả thời tiết
+    Bạn là một trợ lý AI thông minh và hiệu quả với các tính năng sau:{weather_features}
     
     📅 **Tính năng DateTime (luôn có sẵn):**
-    - Xác định ngày giờ hiện tại: `get_current_datetime()` và `get_today_info()`
-    - Biết chính xác ngày hôm nay để xử lý các câu hỏi về thời gian
+    - Ngày hôm nay, ngày mai, tuần này... có sẵn trong **Ngữ cảnh hiện tại** bên dưới
+    - Giờ chính xác đến từng giây: `get_current_datetime()`
     - Tính toán ngày mai, hôm qua, và các ngày tương đối khác
     {calendar_features}
     
     **Model đang sử dụng:** {model_choice.upper()}
     
+    **Ngữ cảnh hiện tại (cập nhật ở mỗi câu hỏi):**
+    {{current_context}}
+    
     **QUAN TRỌNG - Xử lý thời gian:**
-    1. LUÔN sử dụng `get_today_info()` đầu tiên khi cần biết ngày hiện tại
-    2. Khi user hỏi về "ngày mai", "hôm nay", "hôm qua" → dùng thông tin từ get_today_info()
-    3. Khi user hỏi về ngày cụ thể (ví dụ: "30/6/2025"), dùng get_events_by_date() với ngày đó
-    4. Múi giờ mặc định: Asia/Ho_Chi_Minh (UTC+7)
-    5. Hiểu các format ngày: DD/MM/YYYY, YYYY-MM-DD, "ngày mai", v.v.
+    1. Dùng **Ngữ cảnh hiện tại** để biết ngày hiện tại, KHÔNG cần gọi `get_today_info()`
+    2. Khi user hỏi về "ngày mai", "hôm nay", "hôm qua", "tuần này" → tính từ Ngữ cảnh hiện tại
+       rồi gọi thẳng tool cần dùng
+    3. Ngữ cảnh hiện tại KHÔNG có giờ: khi câu hỏi cần giờ hiện tại (bây giờ mấy giờ, "sáng nay"
+       đã qua chưa, còn bao lâu nữa...) phải gọi `get_current_datetime()`
+    4. Khi user hỏi về ngày cụ thể (ví dụ: "30/6/2025"), dùng get_events_by_date() với ngày đó
+    5. Múi giờ mặc định: Asia/Ho_Chi_Minh (UTC+7)
+    6. Hiểu các format ngày: DD/MM/YYYY, YYYY-MM-DD, "ngày mai", v.v.
     
     **Nguyên tắc trả lời:**
     - Trả lời trực tiếp, không hỏi quá nhiều
@@ -131,12 +213,357 @@ def create_agent(model_choice: str = "gpt", enable_calendar: bool = False):
     # Create agent
     agent = create_openai_tools_agent(llm, tools, prompt)
     
+    # Kích thước phần cố định gửi kèm mỗi lần gọi LLM
+    schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools], ensure_ascii=False)
+    prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(schemas)
+    
+    return agent, tools, prompt_tokens
+
+def _registry_key(model_choice, enable_calendar, groups=None):
+    model_key = "gemini" if model_choice.lower() == "gemini" else "gpt"
+    return model_key, bool(enable_calendar), tuple(sorted(groups)) if groups is not None else None
+
+def get_shared_agent(model_choice: str = "gpt", enable_calendar: bool = False, groups=None):
+    """
+    Helper function để lấy agent dùng chung trong process theo
+    (model, enable_calendar, nhóm tool). Lần đầu tạo tools, prompt và fast-path
+    router (LLM client dùng chung giữa các nhóm tool); các lần sau dùng lại.
+    Việc tạo diễn ra ngoài lock nên không chặn các session lấy agent khác;
+    nếu hai luồng cùng tạo một khóa thì bản được lưu trước được dùng.
+    
+    Returns:
+        tuple: (agent, tools, router); router là None với agent chỉ gắn một
+        phần tools (chỉ agent đầy đủ trả lời qua fast path)
+    """
+    key = _registry_key(model_choice, enable_calendar, groups)
+    with _agent_registry_lock:
+        shared = _agent_registry.get(key)
+        if shared is not None:
+            _agent_registry_stats['hits'] += 1
+            return shared
+    started = time.perf_counter()
+    agent, tools, prompt_tokens = _build_agent(*key)
+    router = FastRouter(tools) if groups is None else None
+    elapsed = time.perf_counter() - started
+    with _agent_registry_lock:
+        _agent_registry_stats['builds'] += 1
+        _agent_registry_stats['build_seconds'] += elapsed
+        shared = _agent_registry.get(key)
+        if shared is None:
+            shared = _agent_registry[key] = (agent, tools, router)
+            _agent_prompt_tokens[key] = prompt_tokens
+        return shared
+
+def agent_prompt_tokens(model_choice: str = "gpt", enable_calendar: bool = False, groups=None):
+    """Số token của system prompt và schema tools của agent dùng chung (None nếu chưa tạo)."""
+    key = _registry_key(model_choice, enable_calendar, groups)
+    with _agent_registry_lock:
+        return _agent_prompt_tokens.get(key)
+
+def agent_registry_stats():
+    """Số agent đã tạo, số lần dùng lại và tổng thời gian tạo."""
+    with _agent_registry_lock:
+        stats = dict(_agent_registry_stats)
+        stats['agents'] = len(_agent_registry)
+        return stats
+
+def agent_iteration_stats():
+    """Số vòng gọi LLM trung bình mỗi lượt agent và số lần agent gọi tool ngày giờ."""
+    with _iteration_stats_lock:
+        stats = dict(_iteration_stats)
+    stats['iterations_per_run'] = stats['iterations'] / stats['runs'] if stats['runs'] else 0.0
+    return stats
+
+def _record_iterations(intermediate_steps):
+    """
+    Đếm số vòng gọi LLM của một lượt agent: mỗi nhóm tool call từ cùng một
+    message của LLM là một vòng, cộng vòng cuối sinh câu trả lời.
+    """
+    iterations = 1
+    datetime_calls = 0
+    previous_log = None
+    for action, _ in intermediate_steps:
+        message_log = getattr(action, "message_log", None)
+        if not message_log or message_log != previous_log:
+            iterations += 1
+        previous_log = message_log
+        if action.tool in ("get_today_info", "get_current_datetime"):
+            datetime_calls += 1
+    with _iteration_stats_lock:
+        _iteration_stats['runs'] += 1
+        _iteration_stats['iterations'] += iterations
+        _iteration_stats['datetime_tool_calls'] += datetime_calls
+
+def fast_router_stats():
+    """Thống kê fast-path router gộp trên mọi agent dùng chung."""
+    with _agent_registry_lock:
+        routers = [router for _, _, router in _agent_registry.values() if router is not None]
+    totals = {'requests': 0, 'hits': 0, 'intents': {}}
+    for router in routers:
+        stats = router.stats()
+        totals['requests'] += stats['requests']
+        totals['hits'] += stats['hits']
+        for intent, count in stats['intents'].items():
+            totals['intents'][intent] = totals['intents'].get(intent, 0) + count
+    totals['hit_rate'] = totals['hits'] / totals['requests'] if totals['requests'] else 0.0
+    return totals
+
+class AssistantAgent:
+    """
+    Agent của một session. Câu hỏi khớp fast-path router được trả lời bằng
+    một lần gọi tool; câu hỏi đã được trả lời trong cùng ngữ cảnh lấy từ
+    response cache; các câu khác chuyển cho AgentExecutor (gọi LLM). Khi có
+    tool_selector, mỗi câu hỏi dùng executor chỉ gắn các tool liên quan
+    (tạo bằng executor_factory(agent, tools) và giữ lại theo nhóm tool).
+    
+    invoke() nhận và trả về cùng dạng với AgentExecutor.invoke():
+    {"input": ...} -> {"input": ..., "output": ...}
+    stream() trả dần trạng thái tool và token của câu trả lời.
+    """
+    
+    def __init__(self, executor, router=None, cache=None, model_choice="gpt", enable_calendar=False,
+                 tool_selector=None, executor_factory=None):
+        self.executor = executor
+        self.router = router
+        self.cache = cache
+        self.model_choice = model_choice
+        self.enable_calendar = enable_calendar
+        self.tool_selector = tool_selector
+        self.executor_factory = executor_factory
+        self.tool_names = tuple(sorted(tool.name for tool in executor.tools))
+        # nhóm tool -> executor chỉ gắn các tool đó
+        self._executors = {}
+        # {"first_token": giây, "total": giây} của lần stream() gần nhất
+        self.last_timing = None
+    
+    def _fingerprint(self):
+        """
+        Ngữ cảnh ảnh hưởng tới câu trả lời: model, tools, ngày hiện tại và
+        (khi bật calendar) người dùng. Phiên bản dữ liệu lịch không nằm trong
+        fingerprint mà được lưu kèm các câu trả lời có dùng tool lịch.
+        """
+        today = datetime.now(LOCAL_TZ).date().isoformat()
+        fingerprint = (self.model_choice, self.tool_names, today)
+        if self.enable_calendar:
+            fingerprint += (current_user_id(),)
+        return fingerprint
+    
+    def _answer_without_llm(self, inputs):
+        """
+        Trả lời qua fast-path router hoặc response cache nếu được.
+        
+        Returns:
+            tuple: (result hoặc None, (khóa cache, phiên bản dữ liệu lịch trước
+            khi agent chạy) để lưu câu trả lời của agent, hoặc None)
+        """
+        prompt = inputs.get("input", "")
+        if self.router is not None:
+            routed = self.router.route(prompt)
+            if routed is not None:
+                intent, answer = routed
+                return {**inputs, "output": answer, "fast_path": intent}, None
+        
+        cache_key = None
+        if self.cache is not None:
+            try:
+                cache_key = self.cache.key(prompt, self._fingerprint())
+            except Exception:
+                # Không xác định được ngữ cảnh (ví dụ lỗi đồng bộ lịch): bỏ qua cache
+                cache_key = None
+            if cache_key is not None:
+                # Chỉ entry dựa trên dữ liệu lịch mới phải đồng bộ lịch để kiểm tra
+                cached = self.cache.get(cache_key, calendar_data_version if self.enable_calendar else None)
+                if cached is not None:
+                    return {**inputs, "output": cached, "cached": True}, None
+                if self.enable_calendar:
+                    try:
+                        # Đọc version hiện có, không gọi API
+                        return None, (cache_key, calendar_data_version(refresh=False))
+                    except Exception:
+                        return None, None
+        return None, (cache_key, None) if cache_key is not None else None
+    
+    def _executor_for(self, prompt):
+        """Executor cho câu hỏi: chỉ gắn các tool liên quan nếu có tool_selector."""
+        if self.tool_selector is None:
+            return self.executor
+        groups = self.tool_selector.select(prompt, self.tool_names)
+        full_tokens = agent_prompt_tokens(self.model_choice, self.enable_calendar)
+        executor = self.executor
+        if groups is not None:
+            executor = self._executors.get(groups)
+            if executor is None:
+                agent, tools, _ = get_shared_agent(self.model_choice, self.enable_calendar, groups)
+                executor = self._executors[groups] = self.executor_factory(agent, tools)
+        if full_tokens is not None:
+            prompt_tokens = agent_prompt_tokens(self.model_choice, self.enable_calendar, groups)
+            self.tool_selector.record(full_tokens, prompt_tokens)
+        return executor
+    
+    def _with_date_context(self, inputs):
+        """Thêm ngữ cảnh ngày hiện tại vào input ngay lúc gọi (không bao giờ cũ)."""
+        return {**inputs, "current_context": render_date_context()}
+    
+    def _remember(self, cache_entry, result):
+        steps = result.get("intermediate_steps", ())
+        _record_iterations(steps)
+        if cache_entry is not None:
+            cache_key, data_version = cache_entry
+            used_calendar = any(action.tool in CALENDAR_READ_TOOLS for action, _ in steps)
+            self.cache.put(cache_key, result["output"], steps,
+                           data_version if used_calendar else None)
+    
+    def invoke(self, inputs, config=None, **kwargs):
+        result, cache_entry = self._answer_without_llm(inputs)
+        if result is not None:
+            return result
+        executor = self._executor_for(inputs.get("input", ""))
+        result = executor.invoke(self._with_date_context(inputs), config, **kwargs)
+        self._remember(cache_entry, result)
+        return result
+    
+    def _agent_events(self, executor, inputs):
+        """
+        Chạy AgentExecutor.astream_events() trong thread riêng (event loop riêng)
+        và trả về các event theo kiểu generator đồng bộ cho Streamlit.
+        """
+        events = Queue()
+        
+        def run():
+            async def consume():
+                async for event in executor.astream_events(inputs, version="v1"):
+                    events.put(event)
+            try:
+                asyncio.run(consume())
+            except Exception as error:
+                events.put(error)
+            finally:
+                events.put(None)
+        
+        # Giữ người dùng hiện tại (contextvar) trong thread chạy agent
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+    
+    def stream(self, inputs):
+        """
+        Chạy agent và trả dần kết quả dưới dạng (loại, dữ liệu):
+        - ("status", tên tool) khi agent bắt đầu gọi một tool
+        - ("token", đoạn text) cho từng phần của câu trả lời
+        - ("output", result) khi xong, cùng dạng kết quả của invoke()
+        
+        Thời gian tới token đầu tiên và tổng thời gian được ghi vào last_timing.
+        """
+        started = time.perf_counter()
+        first_token = None
+        result, cache_entry = self._answer_without_llm(inputs)
+        
+        if result is None:
+            root_run_id = None
+            executor = self._executor_for(inputs.get("input", ""))
+            for event in self._agent_events(executor, self._with_date_context(inputs)):
+                if root_run_id is None:
+                    root_run_id = event["run_id"]
+                kind = event["event"]
+                if kind == "on_tool_start":
+                    yield "status", event["name"]
+                elif kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    # Bỏ qua chunk chỉ chứa tool call (content rỗng)
+                    if isinstance(content, str) and content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        yield "token", content
+                elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+                    result = event["data"]["output"]
+            if result is None:
+                raise RuntimeError("Agent kết thúc mà không có câu trả lời")
+            self._remember(cache_entry, result)
+        
+        if first_token is None:
+            # Fast path, cache hoặc model không hỗ trợ streaming: trả cả câu một lần
+            first_token = time.perf_counter() - started
+            yield "token", result["output"]
+        self.last_timing = {"first_token": first_token, "total": time.perf_counter() - started}
+        yield "output", result
+
+def create_agent(model_choice: str = "gpt", enable_calendar: bool = False):
+    """
+    Tạo và trả về AI agent với model và tools được chọn
+    
+    Agent (LLM client, tools, prompt) được dùng chung giữa các session;
+    mỗi lần gọi chỉ tạo một AgentExecutor nhẹ cho session. Fast-path router
+    (tắt bằng FAST_ROUTER_ENABLED=false) trả lời các câu hỏi đơn giản không qua LLM,
+    response cache (tắt bằng RESPONSE_CACHE_ENABLED=false) dùng lại câu trả lời cũ.
+    Các tool call trong cùng một bước chạy song song (tắt bằng PARALLEL_TOOLS_ENABLED=false);
+    mỗi câu hỏi chỉ gắn các tool liên quan (tắt bằng TOOL_SELECTION_ENABLED=false).
+    
+    Args:
+        model_choice (str): "gpt" hoặc "gemini"
+        enable_calendar (bool): Có bật tính năng calendar không
+        
+    Returns:
+        AssistantAgent: Agent của session (bọc AgentExecutor)
+    """
+    if enable_calendar:
+        try:
+            # Test calendar connection (theo tài khoản Google của session hiện tại)
+            from google_auth import calendar_service
+            with calendar_service():
+                pass
+        except Exception as e:
+            raise Exception(f"Lỗi kết nối Google Calendar: {str(e)}")
+        
+        try:
+            # Nhận push notification khi lịch thay đổi (nếu có cấu hình webhook)
+            from calendar_watch import start_calendar_watch
+            start_calendar_watch()
+        except Exception:
+            # Không bắt buộc: bản sao lịch vẫn tự đồng bộ theo CALENDAR_MAX_STALENESS
+            pass
+    
+    agent, tools, router = get_shared_agent(model_choice, enable_calendar)
+    
     # Create agent executor
-    agent_executor = AgentExecutor(
-        agent=agent, 
-        tools=tools, 
-        verbose=False,  # Set to False for cleaner Streamlit output
-        handle_parsing_errors=True
-    )
-    
-    return agent_executor
+    parallel_tools = os.getenv('PARALLEL_TOOLS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+    tool_timeout = float(os.getenv('TOOL_TIMEOUT', '30'))
+    
+    def build_executor(agent, tools):
+        executor_options = dict(
+            agent=agent, 
+            tools=tools, 
+            verbose=False,  # Set to False for cleaner Streamlit output
+            handle_parsing_errors=True,
+            # Response cache cần biết các tool đã dùng để quyết định có cache không
+            return_intermediate_steps=True
+        )
+        if not parallel_tools:
+            return AgentExecutor(**executor_options)
+        # Run tool calls from the same step concurrently, each with a timeout
+        # (except calendar writes, which cannot be cancelled once started)
+        return ConcurrentAgentExecutor(
+            tool_timeout=tool_timeout if tool_timeout > 0 else None,
+            write_tools=CALENDAR_WRITE_TOOLS,
+            **executor_options
+        )
+    
+    agent_executor = build_executor(agent, tools)
+    
+    if os.getenv('FAST_ROUTER_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        router = None
+    cache = None
+    if os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no'):
+        cache = get_response_cache()
+    # Bind only the tools relevant to each question
+    tool_selector = None
+    if os.getenv('TOOL_SELECTION_ENABLED', 'true').lower() not in ('0', 'false', 'no'):
+        tool_selector = get_tool_selector()
+    model_key = "gemini" if model_choice.lower() == "gemini" else "gpt"
+    return AssistantAgent(agent_executor, router, cache, model_key, enable_calendar,
+                          tool_selector, build_executor)
@@ -1,7 +1,18 @@
 import streamlit as st
 import os
+import time
 from dotenv import load_dotenv
-from agent_factory import create_agent
+from agent_factory import create_agent, fast_router_stats, agent_iteration_stats
+from tool_selector import get_tool_selector
+from google_auth import (
+    DEFAULT_USER,
+    LOGIN_STATE_TTL,
+    finish_web_login,
+    set_current_user,
+    start_web_login,
+    web_login_enabled
+)
+from gazetteer import get_gazetteer
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +56,9 @@ def initialize_session_state():
         st.session_state.calendar_enabled = False
     if "current_model" not in st.session_state:
         st.session_state.current_model = None
+    if "google_user" not in st.session_state:
+        # Multi-user mode: no account until the visitor signs in with Google
+        st.session_state.google_user = None if web_login_enabled() else DEFAULT_USER
 
 def check_environment():
     """Check if required environment variables are set"""
@@ -57,6 +71,44 @@ def check_environment():
     
     return missing_vars
 
+def handle_google_login_callback():
+    """Finish the Google web login when Google redirects back with ?state=...&code=..."""
+    params = st.experimental_get_query_params()
+    if "state" not in params or ("code" not in params and "error" not in params):
+        return
+    st.experimental_set_query_params()
+    if "error" in params:
+        st.error(f"❌ Đăng nhập Google thất bại: {params['error'][0]}")
+        return
+    try:
+        # The account comes from the Google token, never from user input
+        st.session_state.google_user = finish_web_login(params["state"][0], params["code"][0])
+        st.session_state.pop("google_login_url", None)
+    except Exception as e:
+        st.error(f"❌ Đăng nhập Google thất bại: {str(e)}")
+
+def render_google_account():
+    """Sign-in / sign-out controls for the session's Google account (multi-user mode)"""
+    if not web_login_enabled():
+        # Single-account mode: the app owner's token.pickle
+        return
+    if st.session_state.google_user:
+        st.text(f"👤 {st.session_state.google_user}")
+        if st.button("🚪 Đăng xuất Google", use_container_width=True):
+            st.session_state.google_user = None
+            st.rerun()
+        return
+    # Reuse the login URL across reruns until its OAuth state expires
+    login_url, started = st.session_state.get("google_login_url", (None, 0))
+    if login_url is None or time.time() - started > LOGIN_STATE_TTL / 2:
+        try:
+            login_url = start_web_login()
+        except Exception as e:
+            st.error(f"❌ Không thể bắt đầu đăng nhập Google: {str(e)}")
+            return
+        st.session_state.google_login_url = (login_url, time.time())
+    st.link_button("🔐 Đăng nhập Google", login_url, use_container_width=True)
+
 def create_sidebar():
     """Create the sidebar with configuration options"""
     with st.sidebar:
@@ -74,6 +126,8 @@ def create_sidebar():
         # Features
         st.subheader("🔧 Tính năng")
         calendar_enabled = st.checkbox("Google Calendar", value=st.session_state.get('calendar_enabled', False))
+        if calendar_enabled:
+            render_google_account()
         
         # API status
         st.subheader("🔑 API Keys")
@@ -151,11 +205,24 @@ def render_chat_interface():
             try:
                 # Get AI response
                 with st.chat_message("assistant"):
-                    with st.spinner("Đang xử lý..."):
-                        response = st.session_state.agent.invoke({"input": prompt})
-                        response_text = response.get('output', 'Không có phản hồi')
-                        st.write(response_text)
-                        st.session_state.messages.append({"role": "assistant", "content": response_text})
+                    # Stream tool status and answer tokens as they arrive
+                    status = st.empty()
+                    placeholder = st.empty()
+                    status.caption("⏳ Đang xử lý...")
+                    streamed_text = ""
+                    response = {}
+                    for kind, data in st.session_state.agent.stream({"input": prompt}):
+                        if kind == "status":
+                            status.caption(f"🔧 Đang dùng công cụ `{data}`...")
+                        elif kind == "token":
+                            streamed_text += data
+                            placeholder.markdown(streamed_text + "▌")
+                        elif kind == "output":
+                            response = data
+                    status.empty()
+                    response_text = response.get('output', 'Không có phản hồi')
+                    placeholder.write(response_text)
+                    st.session_state.messages.append({"role": "assistant", "content": response_text})
                 
             except Exception as e:
                 st.error(f"Lỗi: {str(e)}")
@@ -178,6 +245,8 @@ def render_status_panel():
         # Calendar status
         if st.session_state.calendar_enabled:
             st.info("📅 Calendar: Đã kích hoạt")
+            if st.session_state.google_user not in (None, DEFAULT_USER):
+                st.text(f"👤 {st.session_state.google_user}")
         else:
             st.info("📅 Calendar: Chưa kích hoạt")
         
@@ -185,6 +254,26 @@ def render_status_panel():
         if st.session_state.messages:
             st.text(f"💬 Tin nhắn: {len(st.session_state.messages)}")
         
+        # Latency of the last answer
+        timing = getattr(st.session_state.get("agent"), "last_timing", None)
+        if timing:
+            st.text(f"⏱️ Token đầu tiên: {timing['first_token']:.2f}s / Tổng: {timing['total']:.2f}s")
+        
+        # Fast-path router
+        router_stats = fast_router_stats()
+        if router_stats['requests']:
+            st.text(f"⚡ Trả lời nhanh: {router_stats['hits']}/{router_stats['requests']} ({router_stats['hit_rate']:.0%})")
+        
+        # LLM round trips per agent answer
+        iteration_stats = agent_iteration_stats()
+        if iteration_stats['runs']:
+            st.text(f"🔁 Vòng LLM/câu trả lời: {iteration_stats['iterations_per_run']:.1f}")
+        
+        # Tokens saved by binding only the relevant tools
+        selector_stats = get_tool_selector().stats()
+        if selector_stats['requests']:
+            st.text(f"✂️ Token tiết kiệm: {selector_stats['tokens_saved']} ({selector_stats['saved_rate']:.0%})")
+        
         # Quick examples
         if "agent" in st.session_state and st.session_state.agent:
             st.subheader("💡 Thử ngay:")
@@ -204,6 +293,11 @@ def render_status_panel():
 def main():
     """Main application"""
     initialize_session_state()
+    handle_google_login_callback()
+    # Open the offline gazetteer index, or start building it in the background
+    get_gazetteer()
+    # Google API calls in this run use the session's account
+    set_current_user(st.session_state.google_user)
     create_sidebar()
     
     # Main content area
@@ -0,0 +1,121 @@
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from text_utils import fold_diacritics
+
+# Trọng số theo trường: khớp tiêu đề quan trọng hơn địa điểm/mô tả
+FIELD_WEIGHTS = {
+    'summary': 3.0,
+    'location': 1.5,
+    'description': 1.0,
+}
+# Khớp theo tiền tố ("hop" -> "hoptac") được tính điểm thấp hơn khớp nguyên từ
+PREFIX_MATCH_WEIGHT = 0.5
+# Thưởng khi tiêu đề trùng hoàn toàn với câu truy vấn
+EXACT_SUMMARY_BONUS = 10.0
+
+def tokenize(text):
+    """Tách từ sau khi bỏ dấu và chuyển chữ thường ("Họp Nhóm" -> ["hop", "nhom"])."""
+    return re.findall(r'\w+', fold_diacritics(text or '').casefold())
+
+class EventSearchIndex:
+    """
+    Inverted index cục bộ trên summary/description/location của sự kiện.
+
+    Tìm kiếm không phân biệt dấu tiếng Việt, mọi từ trong truy vấn phải khớp
+    (nguyên từ hoặc tiền tố), kết quả được xếp hạng theo điểm TF-IDF có
+    trọng số theo trường.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._doc_tokens = {}
+        self._summaries = {}
+        self._vocabulary = None
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def add(self, event):
+        """Thêm (hoặc cập nhật) một sự kiện vào index."""
+        event_id = event['id']
+        self.remove(event_id)
+        weights = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for token in tokenize(event.get(field, '')):
+                weights[token] += field_weight
+        for token, weight in weights.items():
+            self._postings[token][event_id] = weight
+        self._doc_tokens[event_id] = set(weights)
+        self._summaries[event_id] = ' '.join(tokenize(event.get('summary', '')))
+        self._vocabulary = None
+
+    def remove(self, event_id):
+        """Xóa sự kiện khỏi index (bỏ qua nếu không có)."""
+        tokens = self._doc_tokens.pop(event_id, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            postings = self._postings[token]
+            postings.pop(event_id, None)
+            if not postings:
+                del self._postings[token]
+        self._summaries.pop(event_id, None)
+        self._vocabulary = None
+
+    def clear(self):
+        self._postings.clear()
+        self._doc_tokens.clear()
+        self._summaries.clear()
+        self._vocabulary = None
+
+    def _expand(self, token):
+        """Các từ trong index khớp với token: (từ, hệ số) cho khớp nguyên từ/tiền tố."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        matches = []
+        i = bisect_left(self._vocabulary, token)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            word = self._vocabulary[i]
+            matches.append((word, 1.0 if word == token else PREFIX_MATCH_WEIGHT))
+            i += 1
+        return matches
+
+    def search(self, query):
+        """
+        Tìm các sự kiện khớp với mọi từ trong truy vấn.
+
+        Args:
+            query (str): Từ khóa tìm kiếm
+
+        Returns:
+            dict: event_id -> điểm liên quan (càng cao càng phù hợp)
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return {}
+        total_docs = len(self._doc_tokens)
+        scores = None
+        for token in query_tokens:
+            token_scores = defaultdict(float)
+            for word, factor in self._expand(token):
+                postings = self._postings[word]
+                idf = math.log(1 + total_docs / len(postings))
+                for event_id, weight in postings.items():
+                    token_scores[event_id] = max(token_scores[event_id], factor * weight * idf)
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                # Mọi từ đều phải khớp (AND)
+                scores = {
+                    event_id: score + token_scores[event_id]
+                    for event_id, score in scores.items() if event_id in token_scores
+                }
+            if not scores:
+                return {}
+        normalized_query = ' '.join(query_tokens)
+        for event_id in scores:
+            if self._summaries.get(event_id) == normalized_query:
+                scores[event_id] += EXACT_SUMMARY_BONUS
+        return scores
@@ -0,0 +1,537 @@
+import heapq
+import os
+from functools import partial
+from itertools import islice
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytz
+from googleapiclient.errors import HttpError
+from dotenv import load_dotenv
+from google_auth import calendar_service, current_user_id, active_user_ids
+from calendar_search import EventSearchIndex
+from interval_index import IntervalIndex
+
+# Load environment variables
+load_dotenv()
+
+LOCAL_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+# Chỉ tải các trường mà tools thực sự dùng (fields projection)
+EVENT_FIELDS = (
+    'nextPageToken,nextSyncToken,'
+    'items(id,iCalUID,status,summary,description,location,start,end,htmlLink,transparency,attendees(self,responseStatus))'
+)
+# Kích thước trang tối đa của events.list
+PAGE_SIZE = 2500
+# Số kết quả truy vấn theo ngày/khoảng ngày được cache
+RANGE_CACHE_SIZE = 256
+# Danh sách calendar (calendarList) được cache trong bao lâu (giây)
+CALENDAR_LIST_TTL = 300
+# Số calendar được truy vấn song song tối đa
+MAX_FANOUT_WORKERS = 8
+
+def parse_event_time(value):
+    """
+    Chuyển start/end của event (dateTime hoặc date) sang datetime UTC.
+    Event cả ngày được tính từ 00:00 theo múi giờ địa phương.
+
+    Args:
+        value (dict): event['start'] hoặc event['end']
+
+    Returns:
+        datetime: Thời điểm theo UTC (timezone-aware)
+    """
+    if 'dateTime' in value:
+        dt = datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = LOCAL_TZ.localize(dt)
+        return dt.astimezone(pytz.UTC)
+    dt = datetime.strptime(value['date'], '%Y-%m-%d')
+    return LOCAL_TZ.localize(dt).astimezone(pytz.UTC)
+
+def overlaps(event_start, event_end, start, end):
+    """Sự kiện có nằm trong kết quả của khoảng [start, end) không (ngữ nghĩa timeMin/timeMax)."""
+    return event_start < end and (event_end > start or event_start >= start)
+
+def event_bounds(event):
+    """
+    Trả về (start_utc, end_utc) của event.
+    Với event cả ngày, end là ngày kết thúc (exclusive) theo API.
+    """
+    start = parse_event_time(event['start'])
+    end = parse_event_time(event.get('end', event['start']))
+    return start, max(start, end)
+
+class EventStream:
+    """
+    Duyệt lazily qua tất cả các trang của events.list (theo nextPageToken),
+    chỉ yêu cầu các trường cần thiết qua `fields=`.
+    Sau khi duyệt hết, `sync_token` chứa nextSyncToken (nếu API trả về).
+
+    Ví dụ:
+        stream = EventStream(service, calendarId='primary', singleEvents=True)
+        for event in stream:
+            ...
+    """
+
+    def __init__(self, service, fields=EVENT_FIELDS, **params):
+        self.service = service
+        self.fields = fields
+        self.params = params
+        self.params.setdefault('maxResults', PAGE_SIZE)
+        self.sync_token = None
+
+    def __iter__(self):
+        params = dict(self.params)
+        while True:
+            response = self.service.events().list(fields=self.fields, **params).execute()
+            for item in response.get('items', []):
+                yield item
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                self.sync_token = response.get('nextSyncToken')
+                return
+            params['pageToken'] = page_token
+
+class CalendarMirror:
+    """
+    Bản sao cục bộ (in-memory) của một Google Calendar.
+
+    Lần đầu thực hiện full sync trong một cửa sổ thời gian (lùi lại
+    lookback_days, tới trước horizon_days), sau đó dùng `syncToken` để chỉ lấy
+    các thay đổi. Các tool đọc trả lời từ bản sao này; dữ liệu được đồng bộ
+    lại khi cũ hơn max_staleness giây hoặc khi bị đánh dấu dirty.
+
+    Sau khi tạo/xóa sự kiện, tool gọi apply_event()/discard_event() với kết quả
+    API trả về (write-through), nên không cần đồng bộ lại. Kết quả truy vấn theo
+    ngày/khoảng ngày được cache và chỉ các khoảng giao với sự kiện thay đổi bị xóa.
+    """
+
+    def __init__(self, calendar_id='primary', max_staleness=60, lookback_days=30,
+                 horizon_days=365, full_sync_interval=24 * 3600, service_lease=calendar_service):
+        self.calendar_id = calendar_id
+        self.max_staleness = max_staleness
+        self.lookback_days = lookback_days
+        self.horizon_days = horizon_days
+        self.full_sync_interval = full_sync_interval
+        self._service_lease = service_lease
+        self._events = {}
+        self._sync_token = None
+        self._window = None
+        self._last_sync = 0.0
+        self._last_full_sync = 0.0
+        # Event thay vì bool dưới self._lock: mark_dirty() không phải chờ sync đang chạy
+        self._dirty = threading.Event()
+        self._dirty.set()
+        self._index = None
+        self._index_version = -1
+        self._search_index = EventSearchIndex()
+        # (start, end) -> kết quả events_between đã tính
+        self._range_cache = {}
+        self._lock = threading.RLock()
+        # Tăng mỗi khi dữ liệu thay đổi, dùng cho các index dẫn xuất
+        self.version = 0
+
+    def _full_sync(self, service):
+        now = datetime.now(pytz.UTC)
+        window = (now - timedelta(days=self.lookback_days), now + timedelta(days=self.horizon_days))
+        stream = EventStream(
+            service,
+            calendarId=self.calendar_id,
+            timeMin=window[0].isoformat(),
+            timeMax=window[1].isoformat(),
+            singleEvents=True
+        )
+        self._events = {}
+        self._search_index.clear()
+        self._range_cache.clear()
+        for item in stream:
+            if item.get('status') != 'cancelled':
+                self._upsert(item)
+        self._sync_token = stream.sync_token
+        self._window = window
+        self._last_full_sync = time.time()
+
+    def _incremental_sync(self, service):
+        """Áp dụng các thay đổi kể từ lần sync trước, trả về số thay đổi."""
+        changes = 0
+        stream = EventStream(
+            service,
+            calendarId=self.calendar_id,
+            syncToken=self._sync_token,
+            singleEvents=True
+        )
+        for item in stream:
+            changes += 1
+            if item.get('status') == 'cancelled':
+                self._remove(item['id'])
+            else:
+                self._upsert(item)
+        self._sync_token = stream.sync_token or self._sync_token
+        return changes
+
+    def _upsert(self, event):
+        previous = self._events.get(event['id'])
+        if previous is not None:
+            self._invalidate_ranges(previous)
+        self._events[event['id']] = event
+        self._invalidate_ranges(event)
+        self._search_index.add(event)
+
+    def _remove(self, event_id):
+        previous = self._events.pop(event_id, None)
+        if previous is not None:
+            self._invalidate_ranges(previous)
+        self._search_index.remove(event_id)
+
+    def _invalidate_ranges(self, event):
+        """Chỉ xóa các kết quả range đã cache có chứa sự kiện này."""
+        if not self._range_cache:
+            return
+        event_start, event_end = event_bounds(event)
+        stale = [
+            key for key in self._range_cache
+            if overlaps(event_start, event_end, key[0], key[1])
+        ]
+        for key in stale:
+            del self._range_cache[key]
+
+    def apply_event(self, event):
+        """
+        Write-through: cập nhật bản sao bằng event resource mà API trả về
+        sau khi insert/update (event 'cancelled' được xóa khỏi bản sao).
+        """
+        with self._lock:
+            if event.get('status') == 'cancelled':
+                self._remove(event['id'])
+            else:
+                self._upsert(event)
+            self.version += 1
+
+    def discard_event(self, event_id):
+        """Write-through: xóa sự kiện khỏi bản sao sau khi API xóa thành công."""
+        with self._lock:
+            self._remove(event_id)
+            self.version += 1
+
+    def sync(self, force_full=False):
+        """
+        Đồng bộ với Google Calendar: incremental nếu có syncToken, ngược lại full sync.
+        Nếu syncToken hết hạn (HTTP 410), tự động full sync lại.
+        """
+        with self._lock, self._service_lease() as service:
+            # Xóa cờ trước khi gọi API: thay đổi báo tới trong lúc sync đánh dấu lại
+            self._dirty.clear()
+            full = (
+                force_full
+                or not self._sync_token
+                or time.time() - self._last_full_sync > self.full_sync_interval
+            )
+            changed = True
+            try:
+                if full:
+                    self._full_sync(service)
+                else:
+                    try:
+                        changed = self._incremental_sync(service) > 0
+                    except HttpError as error:
+                        if error.resp.status != 410:
+                            raise
+                        self._full_sync(service)
+            except Exception:
+                self._dirty.set()
+                raise
+            self._last_sync = time.time()
+            # Chỉ tăng version khi dữ liệu có thể đã thay đổi
+            if changed:
+                self.version += 1
+
+    def ensure_fresh(self):
+        """Đồng bộ nếu dữ liệu cũ hơn max_staleness hoặc đã bị đánh dấu dirty."""
+        with self._lock:
+            if self._dirty.is_set() or time.time() - self._last_sync > self.max_staleness:
+                self.sync()
+
+    def mark_dirty(self):
+        """
+        Đánh dấu cần đồng bộ lại ở lần đọc tiếp theo (ví dụ khi có push notification).
+        Không lấy self._lock nên trả về ngay cả khi đang sync.
+        """
+        self._dirty.set()
+
+    @property
+    def dirty(self):
+        """Có thay đổi chưa được đồng bộ không."""
+        return self._dirty.is_set()
+
+    def covers(self, start, end):
+        """Khoảng [start, end) có nằm trong cửa sổ đã đồng bộ không."""
+        with self._lock:
+            return self._window is not None and self._window[0] <= start and end <= self._window[1]
+
+    def _sorted(self, events):
+        return sorted(events, key=lambda event: (event_bounds(event)[0], event.get('id', '')))
+
+    def _interval_index(self):
+        """Interval index trên (start_utc, end_utc), build lại khi dữ liệu thay đổi."""
+        with self._lock:
+            if self._index is None or self._index_version != self.version:
+                items = []
+                for event in self._sorted(self._events.values()):
+                    start, end = event_bounds(event)
+                    items.append((start, end, event))
+                self._index = IntervalIndex(items)
+                self._index_version = self.version
+            return self._index
+
+    def upcoming(self, n, now=None):
+        """
+        n sự kiện chưa kết thúc, sắp xếp theo thời gian bắt đầu.
+        """
+        now = now or datetime.now(pytz.UTC)
+        self.ensure_fresh()
+        return self._interval_index().overlapping(now, limit=n)
+
+    def events_between(self, start, end):
+        """
+        Các sự kiện giao với khoảng [start, end) (cùng ngữ nghĩa timeMin/timeMax của API).
+        Ngoài cửa sổ đã đồng bộ thì truy vấn trực tiếp API.
+
+        Args:
+            start (datetime): Thời điểm bắt đầu (timezone-aware)
+            end (datetime): Thời điểm kết thúc (timezone-aware)
+
+        Returns:
+            list: Sự kiện sắp xếp theo thời gian bắt đầu
+        """
+        self.ensure_fresh()
+        if not self.covers(start, end):
+            with self._lock, self._service_lease() as service:
+                return list(EventStream(
+                    service,
+                    calendarId=self.calendar_id,
+                    timeMin=start.isoformat(),
+                    timeMax=end.isoformat(),
+                    singleEvents=True,
+                    orderBy='startTime'
+                ))
+        with self._lock:
+            key = (start, end)
+            events = self._range_cache.get(key)
+            if events is None:
+                if len(self._range_cache) >= RANGE_CACHE_SIZE:
+                    self._range_cache.clear()
+                events = self._range_cache[key] = self._interval_index().overlapping(start, end)
+            return list(events)
+
+    def _search_remote(self, query, start, end, limit):
+        """Tìm theo từ khóa qua API (q=) trong khoảng [start, end), None là không giới hạn."""
+        params = dict(calendarId=self.calendar_id, q=query, singleEvents=True,
+                      orderBy='startTime', maxResults=min(limit, PAGE_SIZE))
+        if start is not None:
+            params['timeMin'] = start.isoformat()
+        if end is not None:
+            params['timeMax'] = end.isoformat()
+        # Không giữ self._lock khi gọi API
+        with self._service_lease() as service:
+            return [
+                event for event in islice(EventStream(service, **params), limit)
+                if event.get('status') != 'cancelled'
+            ]
+
+    def search(self, query, max_results=10, upcoming_only=False):
+        """
+        Tìm sự kiện theo từ khóa trên inverted index cục bộ (không phân biệt dấu),
+        xếp hạng theo mức độ liên quan; hòa điểm thì sự kiện sớm hơn đứng trước.
+
+        Index chỉ chứa cửa sổ đã đồng bộ. Khi index không tìm thấy gì, hoặc
+        chưa đủ max_results mà câu tìm kiếm có thể khớp sự kiện ngoài cửa sổ
+        (không giới hạn upcoming_only), phần ngoài cửa sổ được tìm qua API (q=)
+        như trước và nối sau các kết quả cục bộ.
+
+        Args:
+            query (str): Từ khóa tìm kiếm
+            max_results (int): Số kết quả tối đa
+            upcoming_only (bool): Chỉ lấy sự kiện chưa kết thúc
+
+        Returns:
+            list: Danh sách sự kiện đã xếp hạng
+        """
+        self.ensure_fresh()
+        now = datetime.now(pytz.UTC)
+        with self._lock:
+            ranked = []
+            for event_id, score in self._search_index.search(query).items():
+                event = self._events[event_id]
+                start, end = event_bounds(event)
+                if upcoming_only and end <= now:
+                    continue
+                ranked.append((-score, start, event_id, event))
+            window = self._window
+        ranked.sort(key=lambda item: item[:3])
+        events = [item[3] for item in ranked[:max_results]]
+        if events and (upcoming_only or len(events) == max_results):
+            return events
+
+        if window is None:
+            ranges = [(now if upcoming_only else None, None)]
+        else:
+            ranges = [(window[1], None)]
+            if not upcoming_only:
+                ranges.insert(0, (None, window[0]))
+        seen = {event['id'] for event in events}
+        for start, end in ranges:
+            if len(events) >= max_results:
+                break
+            for event in self._search_remote(query, start, end, max_results - len(events)):
+                if event['id'] not in seen:
+                    seen.add(event['id'])
+                    events.append(event)
+        return events[:max_results]
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+# user_id -> (danh sách calendar, thời điểm lấy)
+_calendar_lists = {}
+_calendar_list_lock = threading.Lock()
+
+def get_calendar_mirror(calendar_id='primary', user_id=None):
+    """
+    Helper function để lấy bản sao cục bộ của calendar (mỗi người dùng, mỗi calendar một bản).
+    Độ cũ tối đa cấu hình qua CALENDAR_MAX_STALENESS (giây).
+    """
+    user_id = user_id or current_user_id()
+    with _mirrors_lock:
+        mirror = _mirrors.get((user_id, calendar_id))
+        if mirror is None:
+            # Bỏ bản sao và calendarList của người dùng đã bị loại khỏi LRU session
+            active = active_user_ids() | {user_id}
+            for key in [key for key in _mirrors if key[0] not in active]:
+                del _mirrors[key]
+            with _calendar_list_lock:
+                for stale_user in [key for key in _calendar_lists if key not in active]:
+                    del _calendar_lists[stale_user]
+            mirror = _mirrors[(user_id, calendar_id)] = CalendarMirror(
+                calendar_id,
+                max_staleness=float(os.getenv('CALENDAR_MAX_STALENESS', '60')),
+                lookback_days=int(os.getenv('CALENDAR_SYNC_LOOKBACK_DAYS', '30')),
+                horizon_days=int(os.getenv('CALENDAR_SYNC_HORIZON_DAYS', '365')),
+                service_lease=partial(calendar_service, user_id=user_id)
+            )
+        return mirror
+
+def calendar_data_version(user_id=None, refresh=True):
+    """
+    Phiên bản dữ liệu lịch của người dùng: (calendar_id, version) của mọi bản sao
+    đã tạo. Thay đổi khi lịch có thay đổi.
+
+    Args:
+        user_id (str): Người dùng (mặc định người dùng hiện tại)
+        refresh (bool): Đồng bộ song song các bản sao đã cũ trước khi đọc version;
+            False để chỉ đọc version hiện có (không gọi API)
+    """
+    user_id = user_id or current_user_id()
+    get_calendar_mirror(user_id=user_id)
+    with _mirrors_lock:
+        mirrors = sorted(
+            ((key[1], mirror) for key, mirror in _mirrors.items() if key[0] == user_id),
+            key=lambda item: item[0]
+        )
+    if refresh and len(mirrors) > 1:
+        with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(mirrors))) as executor:
+            list(executor.map(lambda item: item[1].ensure_fresh(), mirrors))
+    elif refresh:
+        mirrors[0][1].ensure_fresh()
+    return tuple((calendar_id, mirror.version) for calendar_id, mirror in mirrors)
+
+def _fetch_calendar_ids(user_id):
+    """Đọc calendarList của người dùng qua API (primary đứng đầu)."""
+    with calendar_service(user_id=user_id) as service:
+        calendar_ids = []
+        page_token = None
+        while True:
+            response = service.calendarList().list(
+                fields='nextPageToken,items(id,primary)',
+                pageToken=page_token
+            ).execute()
+            for item in response.get('items', []):
+                # Luôn dùng 'primary' cho calendar chính để dùng chung bản sao
+                calendar_ids.append('primary' if item.get('primary') else item['id'])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    calendar_ids.sort(key=lambda calendar_id: calendar_id != 'primary')
+    return calendar_ids or ['primary']
+
+def list_calendar_ids(user_id=None):
+    """
+    ID của mọi calendar hiển thị trong calendarList của người dùng (primary đứng đầu).
+    Kết quả được cache CALENDAR_LIST_TTL giây.
+    """
+    user_id = user_id or current_user_id()
+    with _calendar_list_lock:
+        cached = _calendar_lists.get(user_id)
+    if cached is None or time.time() - cached[1] > CALENDAR_LIST_TTL:
+        # Gọi API ngoài lock để người dùng chậm không chặn người dùng khác
+        cached = (_fetch_calendar_ids(user_id), time.time())
+        with _calendar_list_lock:
+            _calendar_lists[user_id] = cached
+    return list(cached[0])
+
+def query_calendars(query, all_calendars=False):
+    """
+    Chạy query(mirror) trên calendar chính, hoặc song song trên mọi calendar.
+    Calendar bị lỗi (ví dụ không đủ quyền) được bỏ qua; nếu tất cả đều lỗi thì raise.
+
+    Args:
+        query (callable): Hàm nhận CalendarMirror và trả về danh sách sự kiện đã sắp xếp
+        all_calendars (bool): Truy vấn mọi calendar trong calendarList
+
+    Returns:
+        list: Một danh sách kết quả cho mỗi calendar truy vấn thành công
+    """
+    if not all_calendars:
+        return [query(get_calendar_mirror())]
+    # Lấy bản sao ở thread hiện tại: người dùng hiện tại (contextvar) không truyền sang worker
+    mirrors = [get_calendar_mirror(calendar_id) for calendar_id in list_calendar_ids()]
+
+    def run(mirror):
+        try:
+            return query(mirror), None
+        except Exception as error:
+            return None, error
+
+    with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(mirrors))) as executor:
+        outcomes = list(executor.map(run, mirrors))
+    results = [events for events, error in outcomes if error is None]
+    if not results:
+        raise outcomes[0][1]
+    return results
+
+def merge_by_start(event_lists, limit=None):
+    """
+    Trộn k danh sách sự kiện đã sắp xếp theo thời gian bắt đầu bằng heap (k-way merge).
+    Sự kiện xuất hiện ở nhiều calendar (cùng iCalUID và giờ bắt đầu) chỉ giữ một lần.
+    """
+    if len(event_lists) == 1:
+        return event_lists[0][:limit] if limit is not None else event_lists[0]
+    keyed = [
+        ((event_bounds(event)[0], event) for event in events)
+        for events in event_lists
+    ]
+    seen = set()
+    merged = []
+    for start, event in heapq.merge(*keyed, key=lambda item: item[0]):
+        identity = (event.get('iCalUID') or event['id'], start)
+        if identity in seen:
+            continue
+        seen.add(identity)
+        merged.append(event)
+        if limit is not None and len(merged) >= limit:
+            break
+    return merged
+
+def fetch_events(query, all_calendars=False, limit=None):
+    """query_calendars() rồi merge_by_start() - tiện ích cho các tool đọc."""
+    return merge_by_start(query_calendars(query, all_calendars), limit)
@@ -1,39 +1,137 @@
 from datetime import datetime, timedelta
+from typing import Any, List
 import pytz
+from langchain.pydantic_v1 import BaseModel, Field, ValidationError
 from langchain.tools import tool
 from googleapiclient.errors import HttpError
-from google_auth import get_calendar_service
+from google_auth import calendar_service
+from calendar_store import get_calendar_mirror, event_bounds, fetch_events
+from scheduling import free_slots, is_busy
+
+# Số request tối đa trong một batch HTTP của Calendar API
+CALENDAR_BATCH_LIMIT = 50
+
+def _parse_date(date_str):
+    """Parse various date formats ('YYYY-MM-DD' hoặc 'DD/MM/YYYY')"""
+    try:
+        # Thử format DD/MM/YYYY
+        if '/' in date_str:
+            day, month, year = date_str.split('/')
+            return datetime(int(year), int(month), int(day))
+        # Thử format YYYY-MM-DD
+        elif '-' in date_str:
+            year, month, day = date_str.split('-')
+            return datetime(int(year), int(month), int(day))
+        else:
+            raise ValueError("Invalid date format")
+    except:
+        raise ValueError(f"Không thể parse ngày '{date_str}'. Vui lòng sử dụng format 'YYYY-MM-DD' hoặc 'DD/MM/YYYY'")
+
+def _parse_event_datetime(time_str):
+    """Parse datetime string and return appropriate format for Google Calendar"""
+    try:
+        # Thử parse với giờ:phút
+        if len(time_str.split()) == 2:
+            dt = datetime.strptime(time_str, '%Y-%m-%d %H:%M')
+            # Chuyển sang UTC
+            local_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+            dt_local = local_tz.localize(dt)
+            dt_utc = dt_local.astimezone(pytz.UTC)
+            return {
+                'dateTime': dt_utc.isoformat(),
+                'timeZone': 'UTC'
+            }
+        else:
+            # Event cả ngày
+            dt = datetime.strptime(time_str, '%Y-%m-%d')
+            return {
+                'date': dt.strftime('%Y-%m-%d')
+            }
+    except ValueError:
+        raise ValueError(f"Định dạng thời gian không hợp lệ: {time_str}. Sử dụng 'YYYY-MM-DD HH:MM' hoặc 'YYYY-MM-DD'")
+
+def _build_event_body(summary, start_time, end_time, description="", location=""):
+    """Tạo event object cho Calendar API từ dữ liệu người dùng nhập"""
+    event = {
+        'summary': summary,
+        'start': _parse_event_datetime(start_time),
+        'end': _parse_event_datetime(end_time),
+    }
+    
+    if description:
+        event['description'] = description
+    if location:
+        event['location'] = location
+    
+    return event
+
+class CalendarEventInput(BaseModel):
+    """Một sự kiện cần tạo trong create_calendar_events_bulk."""
+    summary: str = Field(description="Tiêu đề sự kiện")
+    start_time: str = Field(description="Thời gian bắt đầu, 'YYYY-MM-DD HH:MM' hoặc 'YYYY-MM-DD' (cả ngày)")
+    end_time: str = Field(description="Thời gian kết thúc, cùng định dạng với start_time")
+    description: str = Field("", description="Mô tả sự kiện (không bắt buộc)")
+    location: str = Field("", description="Địa điểm (không bắt buộc)")
+
+class CreateEventsBulkInput(BaseModel):
+    # Từng phần tử được kiểm tra trong tool để phần tử lỗi được báo riêng
+    # thay vì làm hỏng cả batch; schema gửi cho model vẫn có đủ các trường
+    events: List[Any] = Field(description="Danh sách sự kiện cần tạo")
+
+    class Config:
+        @staticmethod
+        def schema_extra(schema, model):
+            # Schema của phần tử được nhúng trực tiếp (không dùng $ref) để Gemini đọc được
+            item_schema = CalendarEventInput.schema()
+            item_schema.pop('title', None)
+            schema['properties']['events']['items'] = item_schema
+
+def _input_error(error):
+    """Mô tả ngắn gọn ValidationError của một phần tử đầu vào."""
+    fields = [str(item['loc'][0]) for item in error.errors() if item['loc'][0] != '__root__']
+    if not fields:
+        return "phần tử không phải là một sự kiện"
+    return f"thiếu hoặc sai trường {', '.join(dict.fromkeys(fields))}"
+
+def _execute_batch(service, requests):
+    """
+    Gửi danh sách request qua batch HTTP của googleapiclient
+    (tối đa CALENDAR_BATCH_LIMIT request mỗi lần gọi).
+    
+    Returns:
+        list: (response, exception) cho từng request, đúng thứ tự đầu vào
+    """
+    results = [None] * len(requests)
+    
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+    
+    for chunk_start in range(0, len(requests), CALENDAR_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for i in range(chunk_start, min(chunk_start + CALENDAR_BATCH_LIMIT, len(requests))):
+            batch.add(requests[i], request_id=str(i))
+        batch.execute()
+    
+    return results
 
 @tool
-def list_upcoming_events(n: int = 10) -> str:
+def list_upcoming_events(n: int = 10, all_calendars: bool = False) -> str:
     """
     Liệt kê n sự kiện sắp tới từ Google Calendar.
     
     Args:
         n (int): Số lượng sự kiện muốn lấy (mặc định 10, tối đa 50)
+        all_calendars (bool): Lấy từ tất cả các calendar (công việc, nhóm, được chia sẻ...), mặc định chỉ calendar chính
         
     Returns:
         str: Danh sách các sự kiện sắp tới
     """
     try:
-        service = get_calendar_service()
-        
         # Giới hạn số lượng sự kiện
         n = min(max(n, 1), 50)
         
-        # Lấy thời gian hiện tại
-        now = datetime.utcnow().isoformat() + 'Z'
-        
-        # Gọi Calendar API
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            maxResults=n,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Lấy từ bản sao cục bộ (tự đồng bộ khi quá cũ)
+        events = fetch_events(lambda mirror: mirror.upcoming(n), all_calendars, limit=n)
         
         if not events:
             return f"Không có sự kiện nào sắp tới trong lịch của bạn."
@@ -90,52 +188,17 @@ def create_calendar_event(summary: str, start_time: str, end_time: str, descript
         str: Kết quả tạo sự kiện
     """
     try:
-        service = get_calendar_service()
-        
-        # Xử lý thời gian
-        def parse_datetime(time_str):
-            """Parse datetime string and return appropriate format for Google Calendar"""
-            try:
-                # Thử parse với giờ:phút
-                if len(time_str.split()) == 2:
-                    dt = datetime.strptime(time_str, '%Y-%m-%d %H:%M')
-                    # Chuyển sang UTC
-                    local_tz = pytz.timezone('Asia/Ho_Chi_Minh')
-                    dt_local = local_tz.localize(dt)
-                    dt_utc = dt_local.astimezone(pytz.UTC)
-                    return {
-                        'dateTime': dt_utc.isoformat(),
-                        'timeZone': 'UTC'
-                    }
-                else:
-                    # Event cả ngày
-                    dt = datetime.strptime(time_str, '%Y-%m-%d')
-                    return {
-                        'date': dt.strftime('%Y-%m-%d')
-                    }
-            except ValueError:
-                raise ValueError(f"Định dạng thời gian không hợp lệ: {time_str}. Sử dụng 'YYYY-MM-DD HH:MM' hoặc 'YYYY-MM-DD'")
-        
-        start_parsed = parse_datetime(start_time)
-        end_parsed = parse_datetime(end_time)
-        
         # Tạo event object
-        event = {
-            'summary': summary,
-            'start': start_parsed,
-            'end': end_parsed,
-        }
-        
-        if description:
-            event['description'] = description
-        if location:
-            event['location'] = location
+        event = _build_event_body(summary, start_time, end_time, description, location)
         
         # Tạo sự kiện
-        created_event = service.events().insert(
-            calendarId='primary',
-            body=event
-        ).execute()
+        with calendar_service() as service:
+            created_event = service.events().insert(
+                calendarId='primary',
+                body=event
+            ).execute()
+        # Ghi thẳng sự kiện API trả về vào bản sao cục bộ
+        get_calendar_mirror().apply_event(created_event)
         
         # Format response
         result = f"✅ Đã tạo sự kiện thành công!\n\n"
@@ -171,32 +234,22 @@ def delete_calendar_event(event_summary: str) -> str:
         str: Kết quả xóa sự kiện
     """
     try:
-        service = get_calendar_service()
-        
-        # Tìm sự kiện
-        now = datetime.utcnow().isoformat() + 'Z'
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            maxResults=50,
-            singleEvents=True,
-            orderBy='startTime',
-            q=event_summary
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Tìm sự kiện sắp tới phù hợp nhất trên index cục bộ
+        events = get_calendar_mirror().search(event_summary, max_results=50, upcoming_only=True)
         
         if not events:
             return f"❌ Không tìm thấy sự kiện nào với tiêu đề '{event_summary}'"
         
-        # Nếu có nhiều sự kiện, xóa sự kiện đầu tiên tìm thấy
+        # Nếu có nhiều sự kiện, xóa sự kiện khớp nhất (hòa điểm thì lấy sự kiện sớm nhất)
         event_to_delete = events[0]
         
         # Xóa sự kiện
-        service.events().delete(
-            calendarId='primary',
-            eventId=event_to_delete['id']
-        ).execute()
+        with calendar_service() as service:
+            service.events().delete(
+                calendarId='primary',
+                eventId=event_to_delete['id']
+            ).execute()
+        get_calendar_mirror().discard_event(event_to_delete['id'])
         
         start = event_to_delete['start'].get('dateTime', event_to_delete['start'].get('date'))
         
@@ -205,8 +258,132 @@ def delete_calendar_event(event_summary: str) -> str:
         result += f"⏰ Thời gian: {start}\n"
         
         if len(events) > 1:
-            result += f"\n⚠️ Lưu ý: Tìm thấy {len(events)} sự kiện tương tự, đã xóa sự kiện đầu tiên."
+            result += f"\n⚠️ Lưu ý: Tìm thấy {len(events)} sự kiện tương tự, đã xóa sự kiện khớp nhất."
+        
+        return result
         
+    except HttpError as error:
+        return f"Lỗi khi xóa sự kiện: {error}"
+    except Exception as error:
+        return f"Đã xảy ra lỗi: {error}"
+
+@tool(args_schema=CreateEventsBulkInput)
+def create_calendar_events_bulk(events: List[Any]) -> str:
+    """
+    Tạo nhiều sự kiện cùng lúc trong Google Calendar (ví dụ chuỗi buổi học).
+    Tất cả được gửi trong một batch request nên nhanh hơn gọi create_calendar_event nhiều lần.
+    
+    Args:
+        events (List[CalendarEventInput]): Danh sách sự kiện, mỗi phần tử gồm:
+            'summary' (tiêu đề), 'start_time', 'end_time' (định dạng 'YYYY-MM-DD HH:MM' hoặc 'YYYY-MM-DD'),
+            'description' và 'location' (không bắt buộc)
+        
+    Returns:
+        str: Kết quả tạo từng sự kiện
+    """
+    try:
+        if not events:
+            return "❌ Danh sách sự kiện trống"
+        
+        # Kiểm tra dữ liệu từng sự kiện trước khi gửi
+        lines = {}
+        bodies = []
+        titles = []
+        for i, item in enumerate(events, 1):
+            summary = (item.get('summary') or 'Không có tiêu đề') if isinstance(item, dict) else str(item)
+            try:
+                event = CalendarEventInput.parse_obj(item)
+                body = _build_event_body(
+                    event.summary,
+                    event.start_time,
+                    event.end_time,
+                    event.description,
+                    event.location
+                )
+            except ValidationError as error:
+                lines[i] = f"{i}. ❌ {summary}: Lỗi dữ liệu đầu vào: {_input_error(error)}"
+                continue
+            except ValueError as error:
+                lines[i] = f"{i}. ❌ {summary}: Lỗi dữ liệu đầu vào: {error}"
+                continue
+            bodies.append(body)
+            titles.append((i, event.summary, event.start_time))
+        
+        with calendar_service() as service:
+            results = _execute_batch(service, [
+                service.events().insert(calendarId='primary', body=body) for body in bodies
+            ])
+        
+        created = 0
+        for (i, summary, start_time), (response, exception) in zip(titles, results):
+            if exception is not None:
+                lines[i] = f"{i}. ❌ {summary}: {exception}"
+            else:
+                created += 1
+                lines[i] = f"{i}. ✅ {summary} ({start_time})"
+                get_calendar_mirror().apply_event(response)
+        
+        result = f"📅 Đã tạo {created}/{len(events)} sự kiện:\n\n"
+        result += "\n".join(lines[i] for i in sorted(lines))
+        return result
+        
+    except HttpError as error:
+        return f"Lỗi khi tạo sự kiện: {error}"
+    except Exception as error:
+        return f"Đã xảy ra lỗi: {error}"
+
+@tool
+def delete_calendar_events_bulk(event_summaries: List[str]) -> str:
+    """
+    Xóa nhiều sự kiện cùng lúc khỏi Google Calendar dựa trên tiêu đề.
+    Mỗi tiêu đề xóa sự kiện sắp tới khớp nhất; tất cả được gửi trong một batch request.
+    
+    Args:
+        event_summaries (List[str]): Danh sách tiêu đề sự kiện cần xóa
+        
+    Returns:
+        str: Kết quả xóa từng sự kiện
+    """
+    try:
+        if not event_summaries:
+            return "❌ Danh sách sự kiện trống"
+        
+        mirror = get_calendar_mirror()
+        
+        # Tìm sự kiện khớp nhất cho từng tiêu đề trên index cục bộ
+        lines = {}
+        targets = []
+        seen_ids = set()
+        for i, event_summary in enumerate(event_summaries, 1):
+            matches = [
+                event for event in mirror.search(event_summary, max_results=50, upcoming_only=True)
+                if event['id'] not in seen_ids
+            ]
+            if not matches:
+                lines[i] = f"{i}. ❌ Không tìm thấy sự kiện '{event_summary}'"
+                continue
+            seen_ids.add(matches[0]['id'])
+            targets.append((i, matches[0]))
+        
+        with calendar_service() as service:
+            results = _execute_batch(service, [
+                service.events().delete(calendarId='primary', eventId=event['id'])
+                for _, event in targets
+            ])
+        
+        deleted = 0
+        for (i, event), (response, exception) in zip(targets, results):
+            summary = event.get('summary', 'Không có tiêu đề')
+            start = event['start'].get('dateTime', event['start'].get('date'))
+            if exception is not None:
+                lines[i] = f"{i}. ❌ {summary}: {exception}"
+            else:
+                deleted += 1
+                lines[i] = f"{i}. ✅ {summary} ({start})"
+                mirror.discard_event(event['id'])
+        
+        result = f"🗑️ Đã xóa {deleted}/{len(event_summaries)} sự kiện:\n\n"
+        result += "\n".join(lines[i] for i in sorted(lines))
         return result
         
     except HttpError as error:
@@ -227,21 +404,11 @@ def search_calendar_events(query: str, max_results: int = 10) -> str:
         str: Danh sách sự kiện tìm thấy
     """
     try:
-        service = get_calendar_service()
-        
         # Giới hạn số lượng kết quả
         max_results = min(max(max_results, 1), 50)
         
-        # Tìm kiếm sự kiện
-        events_result = service.events().list(
-            calendarId='primary',
-            maxResults=max_results,
-            singleEvents=True,
-            orderBy='startTime',
-            q=query
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Tìm kiếm trên index cục bộ, xếp hạng theo mức độ liên quan
+        events = get_calendar_mirror().search(query, max_results)
         
         if not events:
             return f"🔍 Không tìm thấy sự kiện nào với từ khóa '{query}'"
@@ -279,37 +446,20 @@ def search_calendar_events(query: str, max_results: int = 10) -> str:
         return f"Đã xảy ra lỗi: {error}"
 
 @tool
-def get_events_by_date(date: str) -> str:
+def get_events_by_date(date: str, all_calendars: bool = False) -> str:
     """
     Lấy tất cả sự kiện trong một ngày cụ thể.
     
     Args:
         date (str): Ngày cần tìm kiếm (định dạng: 'YYYY-MM-DD' hoặc 'DD/MM/YYYY')
+        all_calendars (bool): Lấy từ tất cả các calendar (công việc, nhóm, được chia sẻ...), mặc định chỉ calendar chính
         
     Returns:
         str: Danh sách các sự kiện trong ngày đó
     """
     try:
-        service = get_calendar_service()
-        
         # Parse và chuẩn hóa ngày
-        def parse_date(date_str):
-            """Parse various date formats"""
-            try:
-                # Thử format DD/MM/YYYY
-                if '/' in date_str:
-                    day, month, year = date_str.split('/')
-                    return datetime(int(year), int(month), int(day))
-                # Thử format YYYY-MM-DD
-                elif '-' in date_str:
-                    year, month, day = date_str.split('-')
-                    return datetime(int(year), int(month), int(day))
-                else:
-                    raise ValueError("Invalid date format")
-            except:
-                raise ValueError(f"Không thể parse ngày '{date_str}'. Vui lòng sử dụng format 'YYYY-MM-DD' hoặc 'DD/MM/YYYY'")
-        
-        target_date = parse_date(date)
+        target_date = _parse_date(date)
         
         # Tạo thời gian bắt đầu và kết thúc cho ngày đó
         start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -326,17 +476,8 @@ def get_events_by_date(date: str) -> str:
         start_utc = start_of_day.astimezone(pytz.UTC)
         end_utc = end_of_day.astimezone(pytz.UTC)
         
-        # Gọi Calendar API
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=start_utc.isoformat(),
-            timeMax=end_utc.isoformat(),
-            maxResults=50,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Lấy từ bản sao cục bộ
+        events = fetch_events(lambda mirror: mirror.events_between(start_utc, end_utc), all_calendars)
         
         if not events:
             return f"📅 Không có sự kiện nào vào ngày {target_date.strftime('%d/%m/%Y')}"
@@ -381,11 +522,158 @@ def get_events_by_date(date: str) -> str:
         return f"❌ Đã xảy ra lỗi: {error}"
 
 @tool
-def get_tomorrow_events() -> str:
+def get_events_in_range(start_date: str, end_date: str, all_calendars: bool = False) -> str:
+    """
+    Lấy tất cả sự kiện trong một khoảng ngày (bao gồm cả ngày đầu và ngày cuối).
+    Dùng cho các câu hỏi như "tuần này", "tháng này", "từ ngày X đến ngày Y".
+    
+    Args:
+        start_date (str): Ngày bắt đầu (định dạng: 'YYYY-MM-DD' hoặc 'DD/MM/YYYY')
+        end_date (str): Ngày kết thúc (định dạng: 'YYYY-MM-DD' hoặc 'DD/MM/YYYY')
+        all_calendars (bool): Lấy từ tất cả các calendar (công việc, nhóm, được chia sẻ...), mặc định chỉ calendar chính
+        
+    Returns:
+        str: Danh sách các sự kiện trong khoảng thời gian đó
+    """
+    try:
+        first_day = _parse_date(start_date)
+        last_day = _parse_date(end_date)
+        if last_day < first_day:
+            first_day, last_day = last_day, first_day
+        
+        # Khoảng [00:00 ngày đầu, 00:00 ngày sau ngày cuối) theo giờ địa phương
+        local_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+        start_utc = local_tz.localize(first_day).astimezone(pytz.UTC)
+        end_utc = local_tz.localize(last_day + timedelta(days=1)).astimezone(pytz.UTC)
+        
+        events = fetch_events(lambda mirror: mirror.events_between(start_utc, end_utc), all_calendars)
+        
+        period = f"{first_day.strftime('%d/%m/%Y')} - {last_day.strftime('%d/%m/%Y')}"
+        if not events:
+            return f"📅 Không có sự kiện nào trong khoảng {period}"
+        
+        result = f"📅 **Lịch trình {period}** ({len(events)} sự kiện):\n\n"
+        
+        for i, event in enumerate(events, 1):
+            summary = event.get('summary', 'Không có tiêu đề')
+            event_start, event_end = event_bounds(event)
+            
+            # Xử lý thời gian
+            if 'dateTime' in event['start']:  # Event có thời gian cụ thể
+                start_local = event_start.astimezone(local_tz)
+                end_local = event_end.astimezone(local_tz)
+                time_str = start_local.strftime('%d/%m/%Y %H:%M')
+                if end_local.date() != start_local.date():
+                    time_str += f" → {end_local.strftime('%d/%m/%Y %H:%M')}"
+            else:  # Event cả ngày (end là ngày kết thúc exclusive)
+                first = event_start.astimezone(local_tz)
+                last = event_end.astimezone(local_tz) - timedelta(days=1)
+                time_str = first.strftime('%d/%m/%Y')
+                if last.date() > first.date():
+                    time_str += f" → {last.strftime('%d/%m/%Y')}"
+                time_str += " (Cả ngày)"
+            
+            location = event.get('location', '')
+            
+            result += f"{i}. 📝 {summary}\n"
+            result += f"   ⏰ {time_str}\n"
+            if location:
+                result += f"   📍 {location}\n"
+            result += "\n"
+        
+        return result.strip()
+        
+    except ValueError as ve:
+        return f"❌ Lỗi định dạng ngày: {str(ve)}"
+    except HttpError as error:
+        return f"❌ Lỗi khi truy cập Google Calendar: {error}"
+    except Exception as error:
+        return f"❌ Đã xảy ra lỗi: {error}"
+
+@tool
+def find_free_slots(date: str, duration_minutes: int = 30, start_time: str = "08:00",
+                    end_time: str = "18:00", end_date: str = "", all_calendars: bool = False) -> str:
+    """
+    Tìm các khoảng thời gian trống trong lịch (ví dụ "chiều mai tôi rảnh lúc nào?").
+    Tính toán trực tiếp từ dữ liệu lịch, không cần liệt kê sự kiện.
+    
+    Args:
+        date (str): Ngày cần tìm (định dạng: 'YYYY-MM-DD' hoặc 'DD/MM/YYYY')
+        duration_minutes (int): Độ dài tối thiểu của khoảng trống (phút, mặc định 30)
+        start_time (str): Giờ bắt đầu khung tìm kiếm mỗi ngày, 'HH:MM' (mặc định '08:00', buổi chiều dùng '13:00')
+        end_time (str): Giờ kết thúc khung tìm kiếm mỗi ngày, 'HH:MM' (mặc định '18:00')
+        end_date (str, optional): Ngày cuối nếu muốn tìm trong nhiều ngày
+        all_calendars (bool): Tính cả sự kiện ở tất cả các calendar, mặc định chỉ calendar chính
+        
+    Returns:
+        str: Danh sách các khoảng thời gian trống
+    """
+    try:
+        first_day = _parse_date(date)
+        last_day = _parse_date(end_date) if end_date else first_day
+        if last_day < first_day:
+            first_day, last_day = last_day, first_day
+        if (last_day - first_day).days > 31:
+            return "❌ Chỉ hỗ trợ tìm khoảng trống tối đa 31 ngày"
+        
+        try:
+            work_start = datetime.strptime(start_time, '%H:%M').time()
+            work_end = datetime.strptime(end_time, '%H:%M').time()
+        except ValueError:
+            raise ValueError(f"Giờ không hợp lệ: '{start_time}' - '{end_time}'. Sử dụng 'HH:MM'")
+        if work_end <= work_start:
+            raise ValueError("Giờ kết thúc phải sau giờ bắt đầu")
+        min_duration = timedelta(minutes=max(duration_minutes, 1))
+        
+        local_tz = pytz.timezone('Asia/Ho_Chi_Minh')
+        now = datetime.now(local_tz)
+        span_start = local_tz.localize(datetime.combine(first_day.date(), work_start))
+        span_end = local_tz.localize(datetime.combine(last_day.date(), work_end))
+        
+        # Các khoảng bận trong toàn bộ khoảng thời gian
+        busy = [
+            event_bounds(event)
+            for event in fetch_events(lambda mirror: mirror.events_between(span_start, span_end), all_calendars)
+            if is_busy(event)
+        ]
+        
+        result = f"🕒 **Khoảng trống** (tối thiểu {int(min_duration.total_seconds() // 60)} phút, {start_time}-{end_time}):\n"
+        day = first_day
+        while day <= last_day:
+            window_start = local_tz.localize(datetime.combine(day.date(), work_start))
+            window_end = local_tz.localize(datetime.combine(day.date(), work_end))
+            # Không gợi ý khoảng thời gian đã qua
+            window_start = max(window_start, now.replace(second=0, microsecond=0))
+            
+            slots = free_slots(busy, window_start, window_end, min_duration) if window_start < window_end else []
+            result += f"\n📅 {day.strftime('%d/%m/%Y')}: "
+            if slots:
+                result += ", ".join(
+                    f"{slot_start.astimezone(local_tz).strftime('%H:%M')}-{slot_end.astimezone(local_tz).strftime('%H:%M')}"
+                    for slot_start, slot_end in slots
+                )
+            else:
+                result += "Không có khoảng trống phù hợp"
+            day += timedelta(days=1)
+        
+        return result.strip()
+        
+    except ValueError as ve:
+        return f"❌ Lỗi dữ liệu đầu vào: {str(ve)}"
+    except HttpError as error:
+        return f"❌ Lỗi khi truy cập Google Calendar: {error}"
+    except Exception as error:
+        return f"❌ Đã xảy ra lỗi: {error}"
+
+@tool
+def get_tomorrow_events(all_calendars: bool = False) -> str:
     """
     Lấy tất cả sự kiện của ngày mai.
     Tool này tự động tính toán ngày mai dựa trên múi giờ Việt Nam.
     
+    Args:
+        all_calendars (bool): Lấy từ tất cả các calendar (công việc, nhóm, được chia sẻ...), mặc định chỉ calendar chính
+        
     Returns:
         str: Danh sách các sự kiện ngày mai
     """
@@ -397,17 +685,20 @@ def get_tomorrow_events() -> str:
         tomorrow_str = tomorrow.strftime('%Y-%m-%d')
         
         # Gọi tool get_events_by_date với ngày mai
-        return get_events_by_date(tomorrow_str)
+        return get_events_by_date({"date": tomorrow_str, "all_calendars": all_calendars})
         
     except Exception as error:
         return f"❌ Lỗi khi lấy lịch ngày mai: {error}"
 
 @tool  
-def get_today_events() -> str:
+def get_today_events(all_calendars: bool = False) -> str:
     """
     Lấy tất cả sự kiện của hôm nay.
     Tool này tự động lấy ngày hiện tại dựa trên múi giờ Việt Nam.
     
+    Args:
+        all_calendars (bool): Lấy từ tất cả các calendar (công việc, nhóm, được chia sẻ...), mặc định chỉ calendar chính
+        
     Returns:
         str: Danh sách các sự kiện hôm nay
     """
@@ -418,7 +709,7 @@ def get_today_events() -> str:
         today_str = today.strftime('%Y-%m-%d')
         
         # Gọi tool get_events_by_date với ngày hôm nay
-        return get_events_by_date(today_str)
+        return get_events_by_date({"date": today_str, "all_calendars": all_calendars})
         
     except Exception as error:
         return f"❌ Lỗi khi lấy lịch hôm nay: {error}"
@@ -0,0 +1,275 @@
+"""
+Nhận push notification từ Google Calendar (events.watch) để biết lịch thay đổi
+bên ngoài trợ lý mà không cần polling.
+
+Google gửi POST tới một địa chỉ HTTPS công khai (CALENDAR_WEBHOOK_URL, ví dụ
+qua reverse proxy/tunnel) được chuyển tiếp về receiver chạy cục bộ
+(CALENDAR_WEBHOOK_HOST:CALENDAR_WEBHOOK_PORT). Mỗi notification đánh dấu bản sao
+lịch là dirty và kích hoạt incremental sync chạy nền. Channel được gia hạn
+trước khi hết hạn.
+
+Có thể kiểm thử cục bộ bằng send_test_notification() thay cho Google.
+"""
+
+import os
+import secrets
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from google_auth import calendar_service, current_user_id
+from calendar_store import get_calendar_mirror
+
+# Load environment variables
+load_dotenv()
+
+class WebhookReceiver:
+    """
+    HTTP server nhỏ nhận notification của Google Calendar.
+    Mỗi request gọi on_notification(channel_id, token, resource_state),
+    giá trị trả về là HTTP status gửi lại cho Google.
+    """
+
+    def __init__(self, on_notification, host='127.0.0.1', port=8765):
+        self.on_notification = on_notification
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Khởi động server trong thread nền. Trả về (host, port) thực tế."""
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                status = receiver.on_notification(
+                    self.headers.get('X-Goog-Channel-ID', ''),
+                    self.headers.get('X-Goog-Channel-Token', ''),
+                    self.headers.get('X-Goog-Resource-State', '')
+                )
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                # Không in log truy cập ra console của Streamlit
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self._server.server_address
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class CalendarWatcher:
+    """
+    Quản lý các watch channel (một channel cho mỗi calendar) và xử lý notification.
+    """
+
+    def __init__(self, address, ttl=7 * 24 * 3600, renew_margin=3600,
+                 service_lease=calendar_service, mirror_getter=get_calendar_mirror):
+        self.address = address
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self._service_lease = service_lease
+        self._mirror_getter = mirror_getter
+        # channel_id -> {calendar_id, user_id, resource_id, token, expiration, timer}
+        self._channels = {}
+        self._syncing = set()
+        self._lock = threading.Lock()
+        self.stats = {'notifications': 0, 'rejected': 0, 'syncs': 0, 'renewals': 0}
+
+    def watch(self, calendar_id='primary', user_id=None):
+        """
+        Đăng ký watch channel cho calendar của người dùng (mặc định người dùng hiện tại)
+        và hẹn giờ gia hạn trước khi hết hạn.
+
+        Returns:
+            str: ID của channel mới
+        """
+        user_id = user_id or current_user_id()
+        channel_id = str(uuid.uuid4())
+        token = secrets.token_urlsafe(24)
+        with self._service_lease(user_id=user_id) as service:
+            response = service.events().watch(
+                calendarId=calendar_id,
+                body={
+                    'id': channel_id,
+                    'type': 'web_hook',
+                    'address': self.address,
+                    'token': token,
+                    'params': {'ttl': str(int(self.ttl))}
+                }
+            ).execute()
+
+        # expiration là epoch milliseconds (dạng chuỗi)
+        expiration = int(response.get('expiration', 0)) / 1000 or time.time() + self.ttl
+        delay = max(expiration - time.time() - self.renew_margin, 60)
+        timer = threading.Timer(delay, self._renew, args=(channel_id,))
+        timer.daemon = True
+        with self._lock:
+            self._channels[channel_id] = {
+                'calendar_id': calendar_id,
+                'user_id': user_id,
+                'resource_id': response.get('resourceId'),
+                'token': token,
+                'expiration': expiration,
+                'timer': timer
+            }
+        timer.start()
+        return channel_id
+
+    def _renew(self, channel_id):
+        """Tạo channel mới rồi dừng channel cũ để không bỏ lỡ notification."""
+        with self._lock:
+            channel = self._channels.get(channel_id)
+        if channel is None:
+            return
+        try:
+            self.watch(channel['calendar_id'], channel['user_id'])
+            self.stats['renewals'] += 1
+        except Exception:
+            # Thử lại sau; trong lúc đó bản sao vẫn tự đồng bộ theo max_staleness
+            timer = threading.Timer(300, self._renew, args=(channel_id,))
+            timer.daemon = True
+            channel['timer'] = timer
+            timer.start()
+            return
+        self.unwatch(channel_id)
+
+    def unwatch(self, channel_id):
+        """Dừng một channel (bỏ qua lỗi nếu channel đã hết hạn phía Google)."""
+        with self._lock:
+            channel = self._channels.pop(channel_id, None)
+        if channel is None:
+            return
+        channel['timer'].cancel()
+        try:
+            with self._service_lease(user_id=channel['user_id']) as service:
+                service.channels().stop(
+                    body={'id': channel_id, 'resourceId': channel['resource_id']}
+                ).execute()
+        except Exception:
+            pass
+
+    def watched_calendars(self):
+        """Các (user_id, calendar_id) đang có channel hoạt động."""
+        with self._lock:
+            return {(channel['user_id'], channel['calendar_id']) for channel in self._channels.values()}
+
+    def stop(self):
+        """Dừng tất cả channel."""
+        with self._lock:
+            channel_ids = list(self._channels)
+        for channel_id in channel_ids:
+            self.unwatch(channel_id)
+
+    def handle_notification(self, channel_id, token, resource_state):
+        """
+        Xử lý một notification, trả về HTTP status cho receiver.
+
+        'sync' là message xác nhận khi tạo channel nên bỏ qua; các trạng thái khác
+        ('exists', 'not_exists') đánh dấu bản sao dirty và đồng bộ nền. Không chờ
+        sync đang chạy, nên Google nhận phản hồi ngay.
+        """
+        with self._lock:
+            channel = self._channels.get(channel_id)
+        if channel is None or not secrets.compare_digest(channel['token'], token):
+            self.stats['rejected'] += 1
+            return 403
+        self.stats['notifications'] += 1
+        if resource_state == 'sync':
+            return 200
+
+        mirror = self._mirror_getter(channel['calendar_id'], channel['user_id'])
+        mirror.mark_dirty()
+        self._sync_in_background((channel['user_id'], channel['calendar_id']), mirror)
+        return 200
+
+    def _sync_in_background(self, key, mirror):
+        """Incremental sync nền; gộp các notification dồn dập thành một lần sync."""
+        with self._lock:
+            if key in self._syncing:
+                return
+            self._syncing.add(key)
+
+        def run():
+            try:
+                # Notification tới trong lúc đang sync đánh dấu dirty lại: sync thêm lần nữa
+                while True:
+                    mirror.ensure_fresh()
+                    self.stats['syncs'] += 1
+                    if not mirror.dirty:
+                        break
+            except Exception:
+                # Bản sao vẫn dirty, lần đọc tiếp theo sẽ đồng bộ lại
+                pass
+            finally:
+                with self._lock:
+                    self._syncing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+def send_test_notification(url, channel_id, token, resource_state='exists'):
+    """
+    Giả lập notification của Google gửi tới receiver (dùng khi kiểm thử cục bộ).
+
+    Returns:
+        int: HTTP status receiver trả về
+    """
+    request = urllib.request.Request(url, data=b'', method='POST', headers={
+        'X-Goog-Channel-ID': channel_id,
+        'X-Goog-Channel-Token': token,
+        'X-Goog-Resource-State': resource_state,
+        'X-Goog-Resource-ID': 'test',
+        'X-Goog-Message-Number': '1',
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+_watcher = None
+_receiver = None
+_watch_lock = threading.Lock()
+
+def start_calendar_watch(calendar_id='primary'):
+    """
+    Bật push notification nếu CALENDAR_WEBHOOK_URL được cấu hình.
+    Gọi nhiều lần vẫn chỉ tạo một receiver và một channel cho mỗi calendar của mỗi người dùng.
+
+    Returns:
+        CalendarWatcher | None: None nếu không cấu hình webhook
+    """
+    global _watcher, _receiver
+    address = os.getenv('CALENDAR_WEBHOOK_URL', '')
+    if not address:
+        return None
+    with _watch_lock:
+        if _watcher is None:
+            _watcher = CalendarWatcher(
+                address,
+                ttl=int(os.getenv('CALENDAR_WATCH_TTL', str(7 * 24 * 3600)))
+            )
+            _receiver = WebhookReceiver(
+                _watcher.handle_notification,
+                host=os.getenv('CALENDAR_WEBHOOK_HOST', '127.0.0.1'),
+                port=int(os.getenv('CALENDAR_WEBHOOK_PORT', '8765'))
+            )
+            _receiver.start()
+        if (current_user_id(), calendar_id) not in _watcher.watched_calendars():
+            _watcher.watch(calendar_id)
+        return _watcher
@@ -0,0 +1,180 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, FrozenSet, List, Optional
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentStep
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+_tool_pool = None
+_tool_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'steps': 0, 'parallel_steps': 0, 'tool_calls': 0, 'timeouts': 0}
+
+def get_tool_pool():
+    """
+    Helper function để lấy thread pool chạy tool dùng chung cho cả process.
+    Số thread tối đa cấu hình qua TOOL_MAX_WORKERS.
+    """
+    global _tool_pool
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            _tool_pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv('TOOL_MAX_WORKERS', '8')),
+                thread_name_prefix='tool'
+            )
+        return _tool_pool
+
+def tool_executor_stats():
+    """Số bước agent, số bước có nhiều tool chạy song song, số lần gọi tool và số lần quá thời gian."""
+    with _stats_lock:
+        return dict(_stats)
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+def _timeout_message(tool_name, timeout, write=False):
+    if write:
+        # Thread của tool vẫn có thể đang ghi: thử lại dễ tạo/xóa trùng
+        return (f"❌ Tool {tool_name} không phản hồi sau {timeout:g} giây, kết quả chưa rõ "
+                f"(thao tác có thể đã được thực hiện). KHÔNG thử lại; hãy báo người dùng "
+                f"kiểm tra lại lịch.")
+    return f"❌ Tool {tool_name} không phản hồi sau {timeout:g} giây, hãy thử lại sau."
+
+class _PendingToolCall:
+    """Một lần gọi tool đã gửi vào pool, kết quả lấy sau bằng result()."""
+
+    def __init__(self, tool, tool_input, kwargs, write=False):
+        self.tool_name = tool.name
+        self.write = write
+        self._started = threading.Event()
+        context = contextvars.copy_context()
+        # Chạy trong bản sao context của thread gọi (người dùng Google hiện tại...)
+        self._future = get_tool_pool().submit(context.run, self._run, tool, tool_input, kwargs)
+
+    def _run(self, tool, tool_input, kwargs):
+        self.started_at = time.monotonic()
+        self._started.set()
+        return tool.run(tool_input, **kwargs)
+
+    def result(self, timeout):
+        """
+        Chờ kết quả của tool.
+
+        Thời gian chờ trong hàng đợi của pool và thời gian chạy tool được
+        tính riêng, mỗi phần tối đa timeout giây.
+
+        Returns:
+            str: Kết quả của tool hoặc thông báo lỗi quá thời gian
+        """
+        if timeout is None:
+            return self._future.result()
+        if not self._started.wait(timeout):
+            if self._future.cancel():
+                _count(timeouts=1)
+                return _timeout_message(self.tool_name, timeout, self.write)
+            self._started.wait()
+        remaining = max(0.0, self.started_at + timeout - time.monotonic())
+        try:
+            return self._future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # Không dừng được thread đang chạy: bỏ qua kết quả khi nó xong
+            _count(timeouts=1)
+            return _timeout_message(self.tool_name, timeout, self.write)
+
+class _DeferredTool:
+    """
+    Bọc một tool để AgentExecutor gửi lần gọi vào pool thay vì chạy ngay.
+
+    run() trả về _PendingToolCall; executor nhận kết quả thật sau khi mọi
+    tool của bước hiện tại đã được gửi đi.
+    """
+
+    def __init__(self, tool, timeout, write=False):
+        self._tool = tool
+        self._timeout = timeout
+        self._write = write
+        self.name = tool.name
+        self.return_direct = tool.return_direct
+
+    def run(self, tool_input, **kwargs):
+        return _PendingToolCall(self._tool, tool_input, kwargs, self._write)
+
+    async def arun(self, tool_input, **kwargs):
+        if self._timeout is None:
+            return await self._tool.arun(tool_input, **kwargs)
+        try:
+            return await asyncio.wait_for(self._tool.arun(tool_input, **kwargs), self._timeout)
+        except asyncio.TimeoutError:
+            _count(timeouts=1)
+            return _timeout_message(self.name, self._timeout, self._write)
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor chạy song song các tool call mà LLM trả về trong cùng một
+    bước (ví dụ thời tiết hai thành phố và lịch hôm nay) trên thread pool
+    dùng chung có giới hạn, thay vì chạy lần lượt từng tool.
+
+    Kết quả vẫn giữ đúng thứ tự các tool call. Tool chạy quá tool_timeout
+    giây (hoặc giá trị riêng trong tool_timeouts) trả về thông báo lỗi cho
+    LLM thay vì làm treo cả câu trả lời. Tool ghi dữ liệu (write_tools) không
+    bị giới hạn thời gian trừ khi có giá trị riêng trong tool_timeouts, vì
+    quá thời gian không dừng được thao tác đang chạy.
+    """
+
+    tool_timeout: Optional[float] = 30.0
+    tool_timeouts: Dict[str, float] = {}
+    write_tools: FrozenSet[str] = frozenset()
+
+    def _timeout_for(self, tool_name):
+        if tool_name in self.tool_timeouts:
+            return self.tool_timeouts[tool_name]
+        return None if tool_name in self.write_tools else self.tool_timeout
+
+    def _deferred_tools(self, name_to_tool_map):
+        return {
+            name: _DeferredTool(tool, self._timeout_for(name), name in self.write_tools)
+            for name, tool in name_to_tool_map.items()
+        }
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs,
+                        intermediate_steps, run_manager=None):
+        # AgentExecutor gọi tool.run() cho từng action theo thứ tự; với tool
+        # bọc, mỗi lần gọi chỉ gửi việc vào pool nên các tool chạy đồng thời
+        items: List = list(super()._iter_next_step(
+            self._deferred_tools(name_to_tool_map), color_mapping, inputs,
+            intermediate_steps, run_manager
+        ))
+        pending = [item for item in items
+                   if isinstance(item, AgentStep) and isinstance(item.observation, _PendingToolCall)]
+        _count(steps=1, tool_calls=len(pending), parallel_steps=int(len(pending) > 1))
+        for item in items:
+            if isinstance(item, AgentStep) and isinstance(item.observation, _PendingToolCall):
+                call = item.observation
+                yield AgentStep(
+                    action=item.action,
+                    observation=call.result(self._timeout_for(call.tool_name))
+                )
+            else:
+                yield item
+
+    async def _aiter_next_step(self, name_to_tool_map, color_mapping, inputs,
+                               intermediate_steps, run_manager=None):
+        # Đường async (streaming) đã chạy các tool call bằng asyncio.gather;
+        # chỉ cần thêm giới hạn thời gian cho từng tool
+        items = [item async for item in super()._aiter_next_step(
+            self._deferred_tools(name_to_tool_map), color_mapping, inputs,
+            intermediate_steps, run_manager
+        )]
+        calls = sum(isinstance(item, AgentStep) for item in items)
+        _count(steps=1, tool_calls=calls, parallel_steps=int(calls > 1))
+        for item in items:
+            yield item
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import threading
+from google.oauth2.credentials import Credentials
+
+class CredentialStore:
+    """
+    Lưu OAuth credentials của nhiều người dùng trong một file JSON
+    ({user_id: authorized user info}).
+
+    Dữ liệu được đọc một lần rồi giữ trong bộ nhớ; mỗi lần thay đổi ghi lại
+    cả file một cách atomic (file tạm + os.replace) nên file trên đĩa luôn
+    là một phiên bản đầy đủ.
+    """
+
+    def __init__(self, path, scopes=None):
+        self.path = path
+        self.scopes = scopes
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError):
+                    # File hỏng: coi như chưa có ai đăng nhập
+                    self._data = {}
+        return self._data
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, user_id):
+        """
+        Credentials đã lưu của người dùng.
+
+        Returns:
+            Credentials | None: None nếu người dùng chưa đăng nhập
+        """
+        with self._lock:
+            info = self._load().get(user_id)
+        if info is None:
+            return None
+        return Credentials.from_authorized_user_info(info, self.scopes)
+
+    def put(self, user_id, creds):
+        """Lưu (hoặc cập nhật) credentials của người dùng."""
+        info = json.loads(creds.to_json())
+        with self._lock:
+            self._load()[user_id] = info
+            self._save()
+
+    def delete(self, user_id):
+        """Xóa credentials của người dùng. Trả về True nếu có dữ liệu bị xóa."""
+        with self._lock:
+            if self._load().pop(user_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def users(self):
+        with self._lock:
+            return sorted(self._load())
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from calendar_store import LOCAL_TZ
+
+# Tên các ngày trong tuần bằng tiếng Việt (theo datetime.weekday())
+WEEKDAYS_VN = ['Thứ Hai', 'Thứ Ba', 'Thứ Tư', 'Thứ Năm', 'Thứ Sáu', 'Thứ Bảy', 'Chủ Nhật']
+
+def _format_day(day):
+    return f"{WEEKDAYS_VN[day.weekday()]} {day.strftime('%Y-%m-%d')} ({day.strftime('%d/%m/%Y')})"
+
+def render_date_context(now=None):
+    """
+    Tạo đoạn ngữ cảnh ngày hiện tại để chèn vào system prompt ở mỗi câu hỏi,
+    giúp agent hiểu "hôm nay", "ngày mai", "tuần này"... mà không cần gọi
+    get_today_info(). Không chứa giờ: câu trả lời chỉ phụ thuộc ngày (được
+    cache theo ngày); giờ hiện tại lấy qua get_current_datetime().
+
+    Args:
+        now (datetime): Thời điểm cần mô tả, mặc định là bây giờ (Asia/Ho_Chi_Minh)
+
+    Returns:
+        str: Các dòng thông tin ngày
+    """
+    now = now.astimezone(LOCAL_TZ) if now is not None else datetime.now(LOCAL_TZ)
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    return "\n".join([
+        f"- Hôm nay: {_format_day(today)}",
+        f"- Múi giờ: Asia/Ho_Chi_Minh (UTC{now.utcoffset().total_seconds() / 3600:+g})",
+        f"- Ngày mai: {_format_day(today + timedelta(days=1))}",
+        f"- Hôm qua: {_format_day(today - timedelta(days=1))}",
+        f"- Tuần này: {week_start.isoformat()} đến {(week_start + timedelta(days=6)).isoformat()}",
+        f"- Tuần sau: {(week_start + timedelta(days=7)).isoformat()} đến {(week_start + timedelta(days=13)).isoformat()}",
+        f"- Tháng này: {month_start.isoformat()} đến {(next_month_start - timedelta(days=1)).isoformat()}",
+    ])
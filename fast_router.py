@@ -0,0 +1,172 @@
+import re
+import threading
+import unicodedata
+from text_utils import fold_diacritics
+
+# Các câu hỏi về thời tiết có yếu tố thời gian khác "bây giờ" cần agent (dự báo);
+# "tuần"/"tháng" chỉ tính khi đi kèm từ chỉ thời gian (không chặn Tuần Giáo, Thăng Bình)
+_NOT_CURRENT_WEATHER = re.compile(
+    r'\b(ngay mai|(?:trong|ca) (?:tuan|thang)|(?:tuan|thang) (?:nay|sau|toi|truoc)|cuoi tuan|'
+    r'du bao|tomorrow|week|weekend|forecast|next)\b'
+)
+# Câu hỏi không nêu một địa điểm cụ thể ("thời tiết ở mấy nơi", "weather where");
+# "đâu" chỉ tính khi đứng riêng (không chặn Dầu Tiếng)
+_VAGUE_LOCATION = re.compile(r'\b(may|vai|nhieu|cac|nao|where|several|some)\b|^dau(?: do| day)?$')
+# Phần bắt được không phải (chỉ) là một địa điểm: nhiều nơi hoặc so sánh
+# ("Hà Nội và Đà Nẵng", "Tokyo so với Hà Nội"), câu hỏi có/không ("có mưa không"),
+# thời điểm khác bây giờ ("hôm qua", "tối nay", "lúc 8 giờ") hoặc tình trạng thời tiết ("lạnh").
+# Địa điểm đã bỏ dấu nên không dùng từ đơn trùng với tên địa danh: can, gio (Cần Thơ,
+# Cần Giờ), co (Cô Tô), hon (Hòn Gai), mai (Mai Châu), luc (Lục Ngạn), nong (Nông Sơn),
+# sao (Sao Đỏ), nang (Đà Nẵng); câu còn sót sẽ được chuyển cho agent khi không tìm thấy địa điểm
+_NOT_A_PLACE = re.compile(
+    r'[,;&/+]|\b('
+    r'va|hoac|voi|so voi|so sanh|'
+    r'khong|chua|gi|bao nhieu|sao roi|'
+    r'hom nay|hom qua|hom kia|(?:sang|trua|chieu|toi|dem) (?:nay|mai)|luc \d+|\d+ ?(?:h|gio)|'
+    r'mua|lanh|dep'
+    r')\b'
+)
+# Từ tiếng Anh chỉ kiểm tra trên câu hỏi tiếng Anh ("can" trùng "Cần" khi đã bỏ dấu)
+_ENGLISH_QUESTION = re.compile(r'(?:what|how|weather)\b')
+_NOT_A_PLACE_EN = re.compile(
+    r'\b('
+    r'and|or|vs|versus|compared?|than|'
+    r'is it|are|does|will|should|can you|could you|what|how|why|'
+    r'yesterday|tonight|morning|afternoon|evening|'
+    r'rain|raining|sunny|cold|hot|warm'
+    r')\b'
+)
+# Câu trả lời của tool cho biết không tra được (ví dụ geocoder không tìm thấy địa điểm)
+_TOOL_MISS_PREFIXES = ('Không thể tìm thấy', 'Lỗi', '❌', 'Error')
+_TIME_WORDS = r'(?:the nao|ra sao|hom nay|bay gio|hien tai|now|today|right now)'
+_TRAILING_WEATHER_WORDS = r'(?:\s+' + _TIME_WORDS + r')*'
+
+# (intent, tool, các pattern trên câu hỏi đã bỏ dấu + chữ thường)
+ROUTES = [
+    ('current_time', 'get_current_datetime', [
+        r'(?:bay gio|hien tai|gio) (?:la )?may gio(?: roi)?',
+        r'may gio roi',
+        r'what time is it(?: now)?',
+        r"what(?:'s| is) the (?:current )?time(?: now)?",
+    ]),
+    ('today_info', 'get_today_info', [
+        r'hom nay (?:la )?(?:thu may|thu gi|ngay may|ngay bao nhieu|ngay gi)',
+        r'(?:what day is (?:it )?today|what day is it)',
+        r"what(?:'s| is) (?:the date today|today'?s date|the date)",
+    ]),
+    ('today_events', 'get_today_events', [
+        r'(?:xem )?(?:lich|su kien|lich trinh)(?: cua toi)? hom nay',
+        r'hom nay (?:toi )?co (?:lich|su kien) gi(?: khong)?',
+        r"what(?:'s| is) on my (?:calendar|schedule) today",
+    ]),
+    ('tomorrow_events', 'get_tomorrow_events', [
+        r'(?:xem )?(?:lich|su kien|lich trinh)(?: cua toi)? ngay mai',
+        r'ngay mai (?:toi )?co (?:lich|su kien) gi(?: khong)?',
+        r"what(?:'s| is) on my (?:calendar|schedule) tomorrow",
+    ]),
+    ('current_weather', 'get_current_weather', [
+        r'(?:thoi tiet|nhiet do)(?: (?:o|tai))? (?P<location>.+?)' + _TRAILING_WEATHER_WORDS,
+        r"(?:what(?:'s| is)|how(?:'s| is)) the weather(?: like)? in (?P<location>.+?)" + _TRAILING_WEATHER_WORDS,
+        r'weather(?: in)? (?P<location>.+?)' + _TRAILING_WEATHER_WORDS,
+    ]),
+]
+
+def _strip_agent_note(answer):
+    """Bỏ dòng "Note: ..." vốn viết cho agent (ví dụ trong get_today_info)."""
+    return re.sub(r'\n+Note:.*$', '', answer, flags=re.S).strip()
+
+def _fold(text):
+    """
+    Bỏ dấu và chuyển chữ thường theo từng ký tự, giữ nguyên độ dài chuỗi
+    để vị trí khớp trên chuỗi đã bỏ dấu dùng được cho chuỗi gốc.
+    """
+    return ''.join(
+        folded if len(folded) == 1 else ch
+        for ch in text
+        for folded in [fold_diacritics(ch).lower()]
+    )
+
+class FastRouter:
+    """
+    Trả lời trực tiếp các câu hỏi chỉ cần đúng một tool ("Bây giờ mấy giờ?",
+    "Hôm nay thứ mấy?", "Thời tiết Tokyo") mà không gọi LLM.
+
+    Câu hỏi phải khớp trọn vẹn một pattern (tiếng Việt có/không dấu hoặc
+    tiếng Anh); mọi câu khác trả về None để agent xử lý như bình thường.
+    """
+
+    def __init__(self, tools):
+        tools_by_name = {tool.name: tool for tool in tools}
+        # Chỉ giữ route có tool tương ứng (ví dụ route lịch khi bật calendar)
+        self._routes = [
+            (intent, tools_by_name[tool_name], [re.compile(pattern) for pattern in patterns])
+            for intent, tool_name, patterns in ROUTES
+            if tool_name in tools_by_name
+        ]
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'hits': 0, 'fallbacks': 0, 'intents': {}}
+
+    def match(self, text):
+        """
+        Tìm intent cho câu hỏi.
+
+        Returns:
+            tuple | None: (intent, tool, tool_input) hoặc None nếu không khớp
+        """
+        original = unicodedata.normalize('NFC', text or '').strip()
+        # Bỏ dấu câu cuối và khoảng trắng thừa, giữ tương ứng vị trí với câu gốc
+        original = re.sub(r'\s+', ' ', original).rstrip(' ?!.')
+        folded = _fold(original)
+        for intent, tool, patterns in self._routes:
+            for pattern in patterns:
+                found = pattern.fullmatch(folded)
+                if found is None:
+                    continue
+                if 'location' not in pattern.groupindex:
+                    return intent, tool, {}
+                location = original[found.start('location'):found.end('location')].strip(' ,')
+                folded_location = found.group('location')
+                if (not location or len(location) > 50 or len(location.split()) > 5
+                        or _NOT_CURRENT_WEATHER.search(folded_location)
+                        or _VAGUE_LOCATION.search(folded_location)
+                        or _NOT_A_PLACE.search(folded_location)
+                        or (_ENGLISH_QUESTION.match(folded)
+                            and _NOT_A_PLACE_EN.search(folded_location))
+                        or re.fullmatch(_TIME_WORDS, folded_location)):
+                    return None
+                return intent, tool, {'location': location}
+        return None
+
+    def route(self, text):
+        """
+        Gọi thẳng tool nếu câu hỏi khớp một intent.
+
+        Returns:
+            tuple | None: (intent, câu trả lời) hoặc None để chuyển cho agent
+            (kể cả khi tool không tra được, ví dụ không tìm thấy địa điểm)
+        """
+        matched = self.match(text)
+        answer = None
+        if matched is not None:
+            intent, tool, tool_input = matched
+            answer = tool.invoke(tool_input)
+        with self._lock:
+            self._stats['requests'] += 1
+            if matched is None:
+                return None
+            if answer.startswith(_TOOL_MISS_PREFIXES):
+                # Tool không tra được (ví dụ không tìm thấy địa điểm): để agent xử lý
+                self._stats['fallbacks'] += 1
+                return None
+            self._stats['hits'] += 1
+            intents = self._stats['intents']
+            intents[intent] = intents.get(intent, 0) + 1
+        return intent, _strip_agent_note(answer)
+
+    def stats(self):
+        """Số câu hỏi, số lần trả lời không qua LLM, số lần tool không tra được, tỷ lệ hit và số hit theo intent."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['intents'] = dict(self._stats['intents'])
+        stats['hit_rate'] = stats['hits'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
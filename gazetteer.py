@@ -0,0 +1,317 @@
+"""
+Gazetteer offline để geocode tên địa điểm mà không cần gọi API.
+
+Dữ liệu nguồn là file dump định dạng GeoNames (ví dụ cities15000.txt,
+tab-separated). File dump được chuyển thành một file index nhị phân
+(<dump>.idx) gồm mảng offset đã sắp xếp theo tên chuẩn hóa, sau đó index
+được memory-map nên khởi động gần như không tốn chi phí. Nếu index chưa có
+hoặc đã cũ, nó được build trong thread nền; trong lúc đó tra cứu trả về None
+và weather_tools dùng geocoder online.
+
+Tên quốc gia lấy từ countryInfo.txt của GeoNames (cùng thư mục với dump hoặc
+GAZETTEER_COUNTRY_FILE) để khớp với tên mà geocoder online trả về.
+
+Chạy trước để build index:
+    python gazetteer.py cities15000.txt [countryInfo.txt]
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from dotenv import load_dotenv
+from text_utils import normalize_key
+
+# Load environment variables
+load_dotenv()
+
+INDEX_MAGIC = b'GZIX'
+INDEX_VERSION = 2
+# magic, version, số record
+HEADER = struct.Struct('<4sIQ')
+OFFSET = struct.Struct('<Q')
+
+# Cột trong file dump GeoNames
+COL_NAME, COL_ASCIINAME, COL_ALTERNATES = 1, 2, 3
+COL_LAT, COL_LON, COL_FEATURE_CLASS, COL_COUNTRY, COL_POPULATION = 4, 5, 6, 8, 14
+# Cột trong countryInfo.txt của GeoNames
+COL_COUNTRY_ISO, COL_COUNTRY_NAME = 0, 4
+# P = thành phố/làng, A = đơn vị hành chính (tỉnh, bang...)
+FEATURE_CLASSES = {'P', 'A'}
+
+def load_country_names(path):
+    """
+    Đọc bảng mã ISO -> tên quốc gia từ countryInfo.txt của GeoNames.
+
+    Args:
+        path (str | None): Đường dẫn countryInfo.txt
+
+    Returns:
+        dict: {"VN": "Vietnam", ...}; rỗng nếu không có file
+    """
+    names = {}
+    if not path or not os.path.exists(path):
+        return names
+    with open(path, 'r', encoding='utf-8') as info:
+        for line in info:
+            if line.startswith('#'):
+                continue
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) > COL_COUNTRY_NAME and cols[COL_COUNTRY_ISO]:
+                names[cols[COL_COUNTRY_ISO]] = cols[COL_COUNTRY_NAME]
+    return names
+
+def default_country_file(dump_path):
+    """File countryInfo.txt dùng cho dump: GAZETTEER_COUNTRY_FILE hoặc cùng thư mục với dump."""
+    return os.getenv('GAZETTEER_COUNTRY_FILE') or os.path.join(
+        os.path.dirname(os.path.abspath(dump_path)), 'countryInfo.txt'
+    )
+
+def build_index(dump_path, index_path, country_file=None):
+    """
+    Đọc file dump GeoNames và ghi file index nhị phân.
+
+    Mỗi record là một dòng "key\\tname\\tcountry\\tlat\\tlon\\tpopulation",
+    sắp xếp theo (key, dân số giảm dần) để record đầu tiên của một key
+    luôn là địa điểm đông dân nhất. country là tên quốc gia nếu có
+    countryInfo.txt, nếu không thì là mã ISO.
+
+    Args:
+        dump_path (str): Đường dẫn file dump GeoNames
+        index_path (str): Đường dẫn file index sẽ ghi
+        country_file (str): Đường dẫn countryInfo.txt (tùy chọn)
+
+    Returns:
+        int: Số record trong index
+    """
+    country_names = load_country_names(country_file)
+    records = []
+    with open(dump_path, 'r', encoding='utf-8') as dump:
+        for line in dump:
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) <= COL_POPULATION or cols[COL_FEATURE_CLASS] not in FEATURE_CLASSES:
+                continue
+            try:
+                population = int(cols[COL_POPULATION] or 0)
+            except ValueError:
+                population = 0
+            names = [cols[COL_NAME], cols[COL_ASCIINAME]] + cols[COL_ALTERNATES].split(',')
+            payload = '\t'.join([
+                cols[COL_NAME].replace('\t', ' '),
+                country_names.get(cols[COL_COUNTRY], cols[COL_COUNTRY]),
+                cols[COL_LAT],
+                cols[COL_LON],
+                str(population)
+            ])
+            for key in {normalize_key(name) for name in names}:
+                if key:
+                    records.append((key.encode('utf-8'), -population, payload))
+
+    records.sort()
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as index:
+        index.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(records)))
+        data = bytearray()
+        offsets = bytearray()
+        for key, _, payload in records:
+            offsets += OFFSET.pack(len(data))
+            data += key + b'\t' + payload.encode('utf-8') + b'\n'
+        index.write(offsets)
+        index.write(data)
+    os.replace(tmp_path, index_path)
+    return len(records)
+
+class Gazetteer:
+    """
+    Tra cứu tên địa điểm trên index đã memory-map.
+
+    start() mở index nếu đã có, hoặc build index trong thread nền; lookup()
+    và suggest() bỏ qua gazetteer (trả về None / []) cho tới khi index sẵn sàng.
+    """
+
+    def __init__(self, dump_path, index_path=None, country_file=None):
+        self.dump_path = dump_path
+        self.index_path = index_path or dump_path + '.idx'
+        self.country_file = country_file or default_country_file(dump_path)
+        self._mmap = None
+        self._count = 0
+        self._data_start = 0
+        self._lock = threading.Lock()
+        self._builder = None
+        # Lỗi của lần build gần nhất (không build lại trong process này)
+        self.error = None
+
+    def _index_is_fresh(self):
+        if not os.path.exists(self.index_path):
+            return False
+        index_mtime = os.path.getmtime(self.index_path)
+        sources = [self.dump_path]
+        if os.path.exists(self.country_file):
+            sources.append(self.country_file)
+        if any(index_mtime < os.path.getmtime(source) for source in sources):
+            return False
+        with open(self.index_path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, _ = HEADER.unpack(header)
+        return magic == INDEX_MAGIC and version == INDEX_VERSION
+
+    def _map(self):
+        """Memory-map index đã build (gọi khi đang giữ _lock)."""
+        with open(self.index_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(mapped, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            mapped.close()
+            raise ValueError(f"File index gazetteer không hợp lệ: {self.index_path}")
+        self._count = count
+        self._data_start = HEADER.size + count * OFFSET.size
+        self._mmap = mapped
+
+    def _build_in_background(self):
+        try:
+            build_index(self.dump_path, self.index_path, self.country_file)
+            with self._lock:
+                self._map()
+        except (OSError, ValueError) as error:
+            self.error = error
+
+    def start(self):
+        """
+        Mở index nếu đã build, nếu chưa thì bắt đầu build trong thread nền.
+
+        Returns:
+            bool: True nếu index đã sẵn sàng để tra cứu
+        """
+        with self._lock:
+            if self._mmap is not None:
+                return True
+            if self._builder is not None or self.error is not None:
+                return False
+            if self._index_is_fresh():
+                self._map()
+                return True
+            self._builder = threading.Thread(
+                target=self._build_in_background, name='gazetteer-index', daemon=True
+            )
+            self._builder.start()
+            return False
+
+    @property
+    def ready(self):
+        return self._mmap is not None
+
+    def wait_ready(self, timeout=None):
+        """Chờ thread build index xong (dùng cho script/CLI). Trả về ready."""
+        if not self.start() and self._builder is not None:
+            self._builder.join(timeout)
+        return self.ready
+
+    def _record(self, i):
+        """Trả về (key, raw_line) của record thứ i."""
+        start = self._data_start + OFFSET.unpack_from(self._mmap, HEADER.size + i * OFFSET.size)[0]
+        end = self._mmap.find(b'\n', start)
+        line = self._mmap[start:end]
+        key, _, payload = line.partition(b'\t')
+        return key, payload
+
+    def _lower_bound(self, key):
+        """Vị trí record đầu tiên có key >= key cần tìm (binary search)."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def _place(payload):
+        name, country, lat, lon, population = payload.decode('utf-8').split('\t')
+        return {
+            "name": name,
+            "country": country,
+            "latitude": float(lat),
+            "longitude": float(lon),
+            "population": int(population)
+        }
+
+    def lookup(self, location):
+        """
+        Tìm địa điểm khớp chính xác với tên (đã chuẩn hóa), ưu tiên nơi đông dân nhất.
+
+        Args:
+            location (str): Tên địa điểm
+
+        Returns:
+            dict | None: name, country, latitude, longitude, population;
+            None nếu không tìm thấy hoặc index chưa sẵn sàng
+        """
+        key = normalize_key(location).encode('utf-8')
+        if not key or not self.start():
+            return None
+        i = self._lower_bound(key)
+        if i < self._count:
+            record_key, payload = self._record(i)
+            if record_key == key:
+                return self._place(payload)
+        return None
+
+    def suggest(self, prefix, limit=5):
+        """
+        Gợi ý các địa điểm có tên bắt đầu bằng prefix, sắp xếp theo dân số.
+
+        Args:
+            prefix (str): Phần đầu tên địa điểm
+            limit (int): Số gợi ý tối đa
+
+        Returns:
+            list: Danh sách địa điểm (dict như lookup)
+        """
+        key = normalize_key(prefix).encode('utf-8')
+        if not key or not self.start():
+            return []
+        places = {}
+        i = self._lower_bound(key)
+        # Giới hạn số record quét để prefix quá ngắn không duyệt toàn bộ index
+        while i < self._count and len(places) < limit * 50:
+            record_key, payload = self._record(i)
+            if not record_key.startswith(key):
+                break
+            place = self._place(payload)
+            places.setdefault((place["name"], place["country"], place["latitude"]), place)
+            i += 1
+        return sorted(places.values(), key=lambda p: -p["population"])[:limit]
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """
+    Helper function để lấy gazetteer dùng chung và bắt đầu mở/build index.
+    Trả về None nếu GAZETTEER_FILE không được cấu hình hoặc không tồn tại.
+    """
+    global _gazetteer
+    dump_path = os.getenv('GAZETTEER_FILE', '')
+    if not dump_path or not os.path.exists(dump_path):
+        return None
+    with _gazetteer_lock:
+        if _gazetteer is None or _gazetteer.dump_path != dump_path:
+            _gazetteer = Gazetteer(dump_path)
+        gazetteer = _gazetteer
+    gazetteer.start()
+    return gazetteer
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python gazetteer.py <geonames_dump.txt> [countryInfo.txt]")
+        sys.exit(1)
+    country_file = sys.argv[2] if len(sys.argv) > 2 else default_country_file(sys.argv[1])
+    if not os.path.exists(country_file):
+        print(f"⚠️ Không có {country_file}: index sẽ lưu mã quốc gia thay vì tên")
+    count = build_index(sys.argv[1], sys.argv[1] + '.idx', country_file)
+    print(f"✅ Đã build index {sys.argv[1]}.idx ({count} record)")
@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from text_utils import normalize_key
+
+# Load environment variables
+load_dotenv()
+
+class GeocodingCache:
+    """
+    Cache kết quả geocoding gồm 2 tầng:
+    - LRU trong bộ nhớ (nhanh, mất khi restart)
+    - SQLite trên đĩa (giữ lại qua các lần restart Streamlit)
+
+    Khóa được chuẩn hóa (chữ thường, bỏ dấu, gộp khoảng trắng) nên
+    "Hà Nội", "ha noi" và "  HA   NOI " dùng chung một entry.
+    Địa điểm không tồn tại được lưu dưới dạng None (negative cache)
+    với thời hạn ngắn hơn để tránh gọi lại API cho cùng một tên sai.
+    """
+
+    def __init__(self, db_path=None, max_entries=1024, ttl=30 * 24 * 3600, negative_ttl=24 * 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+        }
+
+    def _connection(self):
+        """Mở kết nối SQLite khi cần. Trả về None nếu chỉ dùng bộ nhớ."""
+        if self._conn is None and self.db_path:
+            try:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocoding ("
+                    "key TEXT PRIMARY KEY, payload TEXT, created_at REAL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                # Không ghi được file (ví dụ thư mục chỉ đọc) -> chỉ dùng bộ nhớ
+                self._conn = None
+                self.db_path = None
+        return self._conn
+
+    def _expired(self, payload, created_at):
+        ttl = self.ttl if payload is not None else self.negative_ttl
+        return time.time() - created_at > ttl
+
+    def _remember(self, key, payload, created_at):
+        self._memory[key] = (payload, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, location):
+        """
+        Tra cứu địa điểm trong cache.
+
+        Args:
+            location (str): Tên địa điểm người dùng nhập
+
+        Returns:
+            tuple: (hit, place) - hit=False nếu chưa có trong cache,
+                   place=None nếu đã biết là địa điểm không tồn tại
+        """
+        key = normalize_key(location)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(*entry):
+                self._memory.move_to_end(key)
+                self._count_hit('memory_hits', entry[0])
+                return True, entry[0]
+
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT payload, created_at FROM geocoding WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    payload = json.loads(row[0]) if row[0] is not None else None
+                    if not self._expired(payload, row[1]):
+                        self._remember(key, payload, row[1])
+                        self._count_hit('disk_hits', payload)
+                        return True, payload
+
+            self._memory.pop(key, None)
+            self._stats['misses'] += 1
+            return False, None
+
+    def store(self, location, place):
+        """
+        Lưu kết quả geocoding (place=None cho địa điểm không tìm thấy).
+        """
+        key = normalize_key(location)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, place, created_at)
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO geocoding (key, payload, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(place) if place is not None else None, created_at)
+                    )
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def _count_hit(self, counter, payload):
+        self._stats[counter] += 1
+        if payload is None:
+            self._stats['negative_hits'] += 1
+
+    def stats(self):
+        """Trả về bộ đếm hit/miss của cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats['hit_rate'] = hits / total if total else 0.0
+        return stats
+
+    def clear(self):
+        """Xóa toàn bộ cache (bộ nhớ và đĩa)."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM geocoding")
+                conn.commit()
+
+_geocoding_cache = None
+_geocoding_cache_lock = threading.Lock()
+
+def get_geocoding_cache():
+    """
+    Helper function để lấy geocoding cache dùng chung cho cả process.
+    File SQLite cấu hình qua GEOCODING_CACHE_FILE (để trống = chỉ dùng bộ nhớ).
+    """
+    global _geocoding_cache
+    with _geocoding_cache_lock:
+        if _geocoding_cache is None:
+            _geocoding_cache = GeocodingCache(
+                db_path=os.getenv('GEOCODING_CACHE_FILE', 'geocoding_cache.db') or None,
+                max_entries=int(os.getenv('GEOCODING_CACHE_SIZE', '1024'))
+            )
+        return _geocoding_cache
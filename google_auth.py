@@ -1,40 +1,166 @@
+import contextvars
+import json
 import os
 import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import pytz
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from google_auth_oauthlib.flow import Flow, InstalledAppFlow
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
+from service_pool import ServicePool
+from http_client import get_http_client
+from token_refresher import TokenRefresher
+from credential_store import CredentialStore
 
 # Load environment variables
 load_dotenv()
 
 # Google Calendar API scopes
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Discovery document của Calendar API (chỉ tải khi thư viện không kèm bản tĩnh)
+CALENDAR_DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest'
 
-def authenticate_google():
+# Người dùng mặc định (chế độ một tài khoản) dùng GOOGLE_TOKEN_FILE như trước,
+# các người dùng khác lưu trong credential store (GOOGLE_CREDENTIAL_STORE)
+DEFAULT_USER = 'default'
+# Thời gian (giây) một lượt đăng nhập web được chờ Google redirect về
+LOGIN_STATE_TTL = 600
+
+_current_user = contextvars.ContextVar('google_user', default=DEFAULT_USER)
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+_login_lock = threading.Lock()
+# state OAuth -> (Flow, thời điểm bắt đầu) của các lượt đăng nhập web đang chờ
+_pending_logins = {}
+_pending_logins_lock = threading.Lock()
+_credential_store = None
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+class GoogleLoginRequired(Exception):
+    """Người dùng chưa đăng nhập Google (hoặc token đã bị thu hồi) và cần đăng nhập qua web."""
+
+def web_login_enabled():
     """
-    Xử lý xác thực Google OAuth 2.0 và trả về service object để tương tác với Google Calendar API.
+    Chế độ nhiều người dùng: đăng nhập qua OAuth redirect về GOOGLE_OAUTH_REDIRECT_URI.
+    Khi bật, token mặc định (GOOGLE_TOKEN_FILE) không bao giờ được dùng.
+    """
+    return bool(os.getenv('GOOGLE_OAUTH_REDIRECT_URI'))
+
+def current_user_id():
+    """Người dùng Google của request/session hiện tại (contextvar)."""
+    return _current_user.get()
+
+def set_current_user(user_id):
+    """
+    Đặt người dùng Google cho context hiện tại (ví dụ đầu mỗi lượt chạy Streamlit).
+    Trả về token dùng cho _current_user.reset().
+    """
+    return _current_user.set(user_id or DEFAULT_USER)
+
+@contextmanager
+def as_user(user_id):
+    """Chạy một khối lệnh dưới danh nghĩa người dùng khác."""
+    token = set_current_user(user_id)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+def get_credential_store():
+    """
+    Helper function để lấy credential store nhiều người dùng.
+    Đường dẫn cấu hình qua GOOGLE_CREDENTIAL_STORE.
+    """
+    global _credential_store
+    if _credential_store is None:
+        _credential_store = CredentialStore(
+            os.getenv('GOOGLE_CREDENTIAL_STORE', 'google_credentials.json'),
+            scopes=SCOPES
+        )
+    return _credential_store
+
+def save_google_credentials(creds, user_id=DEFAULT_USER):
+    """
+    Lưu credentials của người dùng một cách atomic (ghi file tạm rồi os.replace),
+    nên lần chạy sau không bao giờ đọc phải token ghi dở.
+    Người dùng mặc định lưu vào GOOGLE_TOKEN_FILE, người dùng khác vào credential store.
+    """
+    if user_id != DEFAULT_USER:
+        get_credential_store().put(user_id, creds)
+        return
+    token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
+    token_dir = os.path.dirname(os.path.abspath(token_file))
+    fd, tmp_path = tempfile.mkstemp(dir=token_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as token:
+            pickle.dump(creds, token)
+        os.replace(tmp_path, token_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _read_saved_credentials(user_id):
+    """Credentials đã lưu của người dùng (None nếu chưa có hoặc file token bị lỗi)."""
+    if user_id != DEFAULT_USER:
+        return get_credential_store().get(user_id)
+    token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
+    if not os.path.exists(token_file):
+        return None
+    with open(token_file, 'rb') as token:
+        try:
+            return pickle.load(token)
+        except Exception:
+            pass
+    # Nếu token bị lỗi, xóa nó và tạo mới
+    os.remove(token_file)
+    return None
+
+def _discard_saved_credentials(user_id):
+    """Xóa credentials đã lưu. Trả về đường dẫn/khóa đã xóa, None nếu không có gì."""
+    if user_id != DEFAULT_USER:
+        store = get_credential_store()
+        return store.path if store.delete(user_id) else None
+    token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
+    if not os.path.exists(token_file):
+        return None
+    os.remove(token_file)
+    return token_file
+
+def load_google_credentials(user_id=DEFAULT_USER):
+    """
+    Xử lý xác thực Google OAuth 2.0 và trả về credentials (đọc token đã lưu,
+    refresh nếu hết hạn, hoặc chạy OAuth flow).
+    
+    OAuth flow trên máy local (mở trình duyệt trên máy chạy app) chỉ dùng
+    cho người dùng mặc định ở chế độ một tài khoản; người dùng đăng nhập qua
+    web phải làm lại start_web_login() khi token không còn dùng được.
+    
+    Args:
+        user_id (str): Người dùng cần credentials (mặc định chế độ một tài khoản)
     
     Returns:
-        service: Google Calendar API service object
+        Credentials: Google OAuth credentials
+    
+    Raises:
+        GoogleLoginRequired: Người dùng cần đăng nhập qua web
     """
-    creds = None
-    token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
     credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+    if user_id == DEFAULT_USER and web_login_enabled():
+        raise GoogleLoginRequired("Vui lòng đăng nhập Google để dùng tính năng Calendar.")
     
     # Kiểm tra xem có token đã lưu từ lần chạy trước không
-    if os.path.exists(token_file):
-        with open(token_file, 'rb') as token:
-            try:
-                creds = pickle.load(token)
-            except Exception:
-                # Nếu token bị lỗi, xóa nó và tạo mới
-                os.remove(token_file)
-                creds = None
+    creds = _read_saved_credentials(user_id)
     
     # Nếu không có credentials hợp lệ, yêu cầu người dùng đăng nhập
     if not creds or not creds.valid:
@@ -43,10 +169,14 @@ def authenticate_google():
                 creds.refresh(Request())
             except Exception:
                 # Nếu refresh thất bại, xóa token và yêu cầu đăng nhập lại
-                if os.path.exists(token_file):
-                    os.remove(token_file)
+                _discard_saved_credentials(user_id)
                 creds = None
         
+        if not creds and user_id != DEFAULT_USER:
+            raise GoogleLoginRequired(
+                f"Phiên đăng nhập Google của {user_id} đã hết hạn, vui lòng đăng nhập lại."
+            )
+        
         if not creds:
             if not os.path.exists(credentials_file):
                 raise FileNotFoundError(
@@ -118,42 +248,254 @@ def authenticate_google():
                     raise Exception(f"❌ Google Auth Error: {str(e)}")
         
         # Lưu credentials cho lần chạy tiếp theo
-        with open(token_file, 'wb') as token:
-            pickle.dump(creds, token)
+        save_google_credentials(creds, user_id)
     
-    # Tạo service object
-    service = build('calendar', 'v3', credentials=creds)
-    return service
+    return creds
+
+def _prune_pending_logins(now):
+    """Bỏ các lượt đăng nhập web quá LOGIN_STATE_TTL (gọi khi đang giữ _pending_logins_lock)."""
+    for state, (_, started) in list(_pending_logins.items()):
+        if now - started > LOGIN_STATE_TTL:
+            del _pending_logins[state]
 
-def get_calendar_service():
+def start_web_login():
     """
-    Helper function để lấy calendar service.
-    Sử dụng global variable để tránh phải xác thực lại nhiều lần.
+    Bắt đầu đăng nhập Google qua web (OAuth redirect về GOOGLE_OAUTH_REDIRECT_URI).
+    
+    Returns:
+        str: URL trang đăng nhập Google để chuyển người dùng tới
     """
-    global _calendar_service
-    if '_calendar_service' not in globals() or _calendar_service is None:
-        try:
-            _calendar_service = authenticate_google()
-        except Exception as e:
-            # Reset global variable if authentication fails
-            _calendar_service = None
-            raise e
-    return _calendar_service
+    credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+    flow = Flow.from_client_secrets_file(
+        credentials_file, SCOPES,
+        redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI'),
+        autogenerate_code_verifier=True
+    )
+    authorization_url, state = flow.authorization_url(
+        access_type='offline', prompt='consent', include_granted_scopes='true'
+    )
+    now = time.time()
+    with _pending_logins_lock:
+        _prune_pending_logins(now)
+        _pending_logins[state] = (flow, now)
+    return authorization_url
+
+def finish_web_login(state, code):
+    """
+    Hoàn tất đăng nhập web khi Google redirect về app với ?state=...&code=...
+    
+    Người dùng được xác định bằng chính tài khoản Google vừa đăng nhập (id
+    của calendar chính, tức địa chỉ email), không phải giá trị do client gửi.
+    
+    Args:
+        state (str): Tham số state Google trả về
+        code (str): Authorization code Google trả về
+    
+    Returns:
+        str: user_id (email) của người dùng đã đăng nhập
+    
+    Raises:
+        GoogleLoginRequired: state không hợp lệ, đã dùng hoặc đã hết hạn
+    """
+    with _pending_logins_lock:
+        _prune_pending_logins(time.time())
+        pending = _pending_logins.pop(state, None)
+    if pending is None:
+        raise GoogleLoginRequired("Phiên đăng nhập không hợp lệ hoặc đã hết hạn, vui lòng đăng nhập lại.")
+    flow, _ = pending
+    flow.fetch_token(code=code)
+    creds = flow.credentials
+    
+    primary = build_calendar_service(creds).calendars().get(calendarId='primary').execute()
+    user_id = primary['id']
+    save_google_credentials(creds, user_id)
+    
+    # Session cũ (token cũ) của người dùng này không còn dùng nữa
+    with _sessions_lock:
+        session = _sessions.pop(user_id, None)
+    if session is not None:
+        session.close()
+    return user_id
+
+def load_calendar_discovery():
+    """
+    Discovery document của Calendar API đã parse, giữ trong bộ nhớ để mọi
+    service dùng chung (không đọc và parse lại JSON mỗi lần build).
+
+    Thứ tự: bản tĩnh đi kèm googleapiclient -> file cache trên đĩa
+    (CALENDAR_DISCOVERY_CACHE) -> tải từ Google rồi ghi vào file cache.
+
+    Returns:
+        dict: Discovery document
+    """
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            cache_file = os.getenv('CALENDAR_DISCOVERY_CACHE', 'calendar_discovery.json')
+            content = discovery_cache.get_static_doc('calendar', 'v3')
+            if content is None and os.path.exists(cache_file):
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            if content is None:
+                content = get_http_client().get(CALENDAR_DISCOVERY_URL, endpoint='calendar.discovery').text
+                # Ghi atomic: process khác không bao giờ đọc phải file ghi dở
+                cache_dir = os.path.dirname(os.path.abspath(cache_file))
+                fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, cache_file)
+            _discovery_doc = json.loads(content)
+        return _discovery_doc
+
+def build_calendar_service(creds):
+    """
+    Tạo Google Calendar API service object từ credentials và discovery document đã cache.
+    Mỗi service dùng một kết nối httplib2 riêng (không thread-safe), nên mỗi
+    thread cần service riêng - xem calendar_service().
+    """
+    return build_from_document(load_calendar_discovery(), credentials=creds)
+
+def authenticate_google():
+    """
+    Xử lý xác thực Google OAuth 2.0 và trả về service object để tương tác với Google Calendar API.
+    
+    Returns:
+        service: Google Calendar API service object
+    """
+    return build_calendar_service(get_google_credentials())
 
-def reset_google_auth():
+class GoogleSession:
+    """
+    Tài nguyên Google của một người dùng: credentials, token refresher
+    và pool Calendar service dùng chung credentials đó.
+    """
+
+    def __init__(self, user_id, creds):
+        self.user_id = user_id
+        self.credentials = creds
+        self.last_used = time.time()
+        self.refresher = None
+        # Làm mới token trước khi hết hạn để lời gọi API không phải chờ refresh
+        if creds.refresh_token:
+            self.refresher = TokenRefresher(
+                creds,
+                margin=float(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', '300')),
+                on_refresh=lambda refreshed: save_google_credentials(refreshed, user_id)
+            ).start()
+        self.pool = ServicePool(
+            lambda: build_calendar_service(creds),
+            max_size=int(os.getenv('CALENDAR_SERVICE_POOL_SIZE', '10')),
+            acquire_timeout=float(os.getenv('CALENDAR_SERVICE_POOL_TIMEOUT', '30'))
+        )
+
+    def close(self):
+        """Dừng refresher và bỏ các service đang rảnh."""
+        if self.refresher is not None:
+            self.refresher.stop()
+        self.pool.clear()
+
+def _evict_idle_sessions(now):
+    """
+    Bỏ session không dùng quá GOOGLE_USER_IDLE_TTL giây khỏi _sessions
+    (gọi khi đang giữ _sessions_lock).
+    
+    Returns:
+        list: Các session bị loại; người gọi close() chúng sau khi nhả lock
+        (close() chờ thread refresher dừng)
+    """
+    idle_ttl = float(os.getenv('GOOGLE_USER_IDLE_TTL', '1800'))
+    evicted = []
+    for user_id, session in list(_sessions.items()):
+        if now - session.last_used > idle_ttl and session.pool.stats()['in_use'] == 0:
+            del _sessions[user_id]
+            evicted.append(session)
+    return evicted
+
+def _close_sessions(sessions):
+    for session in sessions:
+        session.close()
+
+def get_google_session(user_id=None):
+    """
+    Helper function để lấy session Google của người dùng (mặc định người dùng hiện tại).
+
+    Session được giữ trong LRU tối đa GOOGLE_MAX_USERS người dùng, nên request
+    tiếp theo không phải đọc lại token hay tạo lại service.
+    """
+    user_id = user_id or current_user_id()
+    now = time.time()
+    with _sessions_lock:
+        evicted = _evict_idle_sessions(now)
+        session = _sessions.get(user_id)
+        if session is not None:
+            _sessions.move_to_end(user_id)
+            session.last_used = now
+    _close_sessions(evicted)
+    if session is not None:
+        return session
+
+    # Đọc token/OAuth flow ngoài _sessions_lock để không chặn người dùng khác
+    with _login_lock:
+        with _sessions_lock:
+            session = _sessions.get(user_id)
+        if session is None:
+            session = GoogleSession(user_id, load_google_credentials(user_id))
+            evicted = []
+            with _sessions_lock:
+                _sessions[user_id] = session
+                max_users = int(os.getenv('GOOGLE_MAX_USERS', '32'))
+                while len(_sessions) > max_users:
+                    evicted.append(_sessions.popitem(last=False)[1])
+            _close_sessions(evicted)
+    session.last_used = time.time()
+    return session
+
+def active_user_ids():
+    """Các người dùng đang có session (dùng để dọn dữ liệu của người dùng đã bị loại)."""
+    with _sessions_lock:
+        return set(_sessions)
+
+def get_google_credentials(user_id=None):
+    """
+    Helper function để lấy credentials dùng chung cho mọi service object của người dùng.
+    """
+    return get_google_session(user_id).credentials
+
+def get_calendar_service_pool(user_id=None):
+    """
+    Helper function để lấy pool Calendar service của người dùng.
+    Kích thước pool cấu hình qua CALENDAR_SERVICE_POOL_SIZE.
+    """
+    return get_google_session(user_id).pool
+
+def calendar_service(timeout=None, user_id=None):
+    """
+    Mượn một Calendar service từ pool của người dùng (thread-safe),
+    trả lại khi ra khỏi khối `with`.
+
+    Ví dụ:
+        with calendar_service() as service:
+            service.events().insert(calendarId='primary', body=body).execute()
+    """
+    return get_calendar_service_pool(user_id).lease(timeout)
+
+def reset_google_auth(user_id=None):
     """
     Reset Google authentication by removing stored tokens.
     Useful when OAuth flow encounters errors.
     """
-    token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
-    if os.path.exists(token_file):
-        try:
-            os.remove(token_file)
-            return f"✅ Đã xóa {token_file}. Vui lòng thử đăng nhập lại."
-        except Exception as e:
-            return f"❌ Không thể xóa {token_file}: {str(e)}"
-    else:
-        return f"ℹ️ File {token_file} không tồn tại."
+    user_id = user_id or current_user_id()
+    with _sessions_lock:
+        session = _sessions.pop(user_id, None)
+    if session is not None:
+        session.close()
+    try:
+        removed = _discard_saved_credentials(user_id)
+    except Exception as e:
+        return f"❌ Không thể xóa token của {user_id}: {str(e)}"
+    if removed:
+        return f"✅ Đã xóa token của {user_id} ({removed}). Vui lòng thử đăng nhập lại."
+    return f"ℹ️ Không có token đã lưu cho {user_id}."
 
 def validate_credentials_file():
     """
@@ -170,14 +512,20 @@ def validate_credentials_file():
             creds_data = json.load(f)
             
         # Check if it has the required structure
-        if 'installed' not in creds_data:
-            return False, "❌ File credentials.json không đúng định dạng (thiếu 'installed' key)"
+        # (Desktop client "installed", or Web client "web" for web login)
+        client_type = 'web' if web_login_enabled() else 'installed'
+        if client_type not in creds_data:
+            return False, f"❌ File credentials.json không đúng định dạng (thiếu '{client_type}' key)"
             
         required_fields = ['client_id', 'client_secret', 'redirect_uris']
         for field in required_fields:
-            if field not in creds_data['installed']:
+            if field not in creds_data[client_type]:
                 return False, f"❌ File credentials.json thiếu field '{field}'"
         
+        redirect_uri = os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
+        if redirect_uri and redirect_uri not in creds_data[client_type]['redirect_uris']:
+            return False, f"❌ {redirect_uri} chưa có trong 'Authorized redirect URIs' của OAuth client"
+        
         return True, "✅ File credentials.json hợp lệ"
         
     except json.JSONDecodeError:
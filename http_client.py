@@ -0,0 +1,162 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Các status nên thử lại (quá tải hoặc lỗi tạm thời của server)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """
+    HTTP client dùng chung cho các tool gọi API bên ngoài.
+
+    - Connection pool (keep-alive) dùng chung giữa các thread thông qua một
+      HTTPAdapter; mỗi thread có Session riêng nên không chia sẻ state.
+    - Timeout connect/read cho từng request, tránh treo agent khi upstream chậm.
+    - Thử lại có giới hạn với exponential backoff + jitter.
+    - Thống kê latency theo từng endpoint.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10.0,
+                 max_retries=2, backoff_base=0.3, backoff_max=5.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self._local = threading.local()
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def _session(self):
+        """Session riêng cho thread hiện tại, dùng chung connection pool."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    def _backoff(self, attempt, response=None):
+        """Thời gian chờ trước lần thử tiếp theo (full jitter, tôn trọng Retry-After)."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url, params=None, endpoint=None, timeout=None):
+        """
+        Gửi GET request với timeout và retry.
+
+        Args:
+            url (str): URL cần gọi
+            params (dict, optional): Query parameters
+            endpoint (str, optional): Tên endpoint dùng cho thống kê (mặc định host + path)
+            timeout (tuple, optional): (connect, read) timeout, ghi đè mặc định
+
+        Returns:
+            requests.Response: Response thành công (status 2xx)
+
+        Raises:
+            requests.RequestException: Khi hết số lần thử lại
+        """
+        endpoint = endpoint or self._endpoint_name(url)
+        session = self._session()
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            response = None
+            try:
+                response = session.get(url, params=params, timeout=timeout or self.timeout)
+                retryable = response.status_code in RETRY_STATUSES
+                if not retryable or attempt >= self.max_retries:
+                    self._record(endpoint, time.perf_counter() - started, attempt, error=not response.ok)
+                    response.raise_for_status()
+                    return response
+                # Trả connection về pool trước khi thử lại
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    self._record(endpoint, time.perf_counter() - started, attempt, error=True)
+                    raise
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def get_json(self, url, params=None, endpoint=None, timeout=None):
+        """Như get() nhưng trả về body đã parse JSON."""
+        return self.get(url, params=params, endpoint=endpoint, timeout=timeout).json()
+
+    @staticmethod
+    def _endpoint_name(url):
+        parsed = urlparse(url)
+        return f"{parsed.netloc}{parsed.path}"
+
+    def _record(self, endpoint, seconds, retries, error=False):
+        with self._metrics_lock:
+            metric = self._metrics.get(endpoint)
+            if metric is None:
+                metric = self._metrics[endpoint] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'total_seconds': 0.0,
+                    'max_seconds': 0.0,
+                    'recent': deque(maxlen=200),
+                }
+            metric['requests'] += 1
+            metric['errors'] += int(error)
+            metric['retries'] += retries
+            metric['total_seconds'] += seconds
+            metric['max_seconds'] = max(metric['max_seconds'], seconds)
+            metric['recent'].append(seconds)
+
+    def metrics(self):
+        """
+        Thống kê latency theo endpoint.
+
+        Returns:
+            dict: endpoint -> requests, errors, retries, avg/p50/p95/max (giây)
+        """
+        result = {}
+        with self._metrics_lock:
+            for endpoint, metric in self._metrics.items():
+                recent = sorted(metric['recent'])
+                result[endpoint] = {
+                    'requests': metric['requests'],
+                    'errors': metric['errors'],
+                    'retries': metric['retries'],
+                    'avg_seconds': metric['total_seconds'] / metric['requests'],
+                    'p50_seconds': recent[len(recent) // 2],
+                    'p95_seconds': recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                    'max_seconds': metric['max_seconds'],
+                }
+        return result
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    """
+    Helper function để lấy HTTP client dùng chung cho cả process.
+    Cấu hình qua HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(
+                pool_size=int(os.getenv('HTTP_POOL_SIZE', '10')),
+                connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05')),
+                read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '10')),
+                max_retries=int(os.getenv('HTTP_MAX_RETRIES', '2'))
+            )
+        return _http_client
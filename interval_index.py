@@ -0,0 +1,101 @@
+from bisect import bisect_left
+
+class _Node:
+    """Một node của centered interval tree."""
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, by_start, by_end, left, right):
+        self.center = center
+        self.by_start = by_start
+        self.by_end = by_end
+        self.left = left
+        self.right = right
+
+class IntervalIndex:
+    """
+    Index tĩnh cho các khoảng [start, end) để truy vấn giao nhau trong O(log n + k).
+
+    Một khoảng giao với [a, b) khi và chỉ khi:
+    - start nằm trong [a, b)       -> tìm bằng binary search trên mảng start đã sắp xếp
+    - hoặc start < a và end > a    -> stabbing query tại a trên centered interval tree
+    Hai tập này rời nhau nên không cần khử trùng lặp.
+
+    Các phần tử là tuple (start, end, value); start/end chỉ cần so sánh được
+    (datetime, số...). Index không sửa được sau khi tạo - build lại khi dữ liệu đổi.
+    """
+
+    def __init__(self, items):
+        self._items = sorted(items, key=lambda item: item[0])
+        self._starts = [item[0] for item in self._items]
+        self._root = self._build(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    @classmethod
+    def _build(cls, items):
+        if not items:
+            return None
+        endpoints = sorted([item[0] for item in items] + [item[1] for item in items])
+        center = endpoints[len(endpoints) // 2]
+        here, left, right = [], [], []
+        for item in items:
+            if item[1] < center:
+                left.append(item)
+            elif item[0] > center:
+                right.append(item)
+            else:
+                here.append(item)
+        return _Node(
+            center,
+            sorted(here, key=lambda item: item[0]),
+            sorted(here, key=lambda item: item[1], reverse=True),
+            cls._build(left),
+            cls._build(right)
+        )
+
+    def _stab(self, point):
+        """Các khoảng có start < point < end."""
+        found = []
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                # Mọi khoảng ở node đều có end >= center > point
+                for item in node.by_start:
+                    if item[0] >= point:
+                        break
+                    found.append(item)
+                node = node.left
+            elif point > node.center:
+                # Mọi khoảng ở node đều có start <= center < point
+                for item in node.by_end:
+                    if item[1] <= point:
+                        break
+                    found.append(item)
+                node = node.right
+            else:
+                # point == center: các khoảng ở cây con trái/phải không chứa point
+                found.extend(item for item in node.by_start if item[0] < point < item[1])
+                break
+        return found
+
+    def overlapping(self, start, end=None, limit=None):
+        """
+        Các phần tử giao với [start, end), sắp xếp theo start.
+
+        Args:
+            start: Đầu khoảng truy vấn
+            end (optional): Cuối khoảng truy vấn (None = không giới hạn)
+            limit (int, optional): Số phần tử tối đa
+
+        Returns:
+            list: Các value tương ứng
+        """
+        stabbed = sorted(self._stab(start), key=lambda item: item[0])
+        first = bisect_left(self._starts, start)
+        last = len(self._starts) if end is None else bisect_left(self._starts, end)
+        if limit is not None:
+            last = min(last, first + max(0, limit - len(stabbed)))
+        values = [item[2] for item in stabbed] + [item[2] for item in self._items[first:last]]
+        return values if limit is None else values[:limit]
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from text_utils import normalize_key
+
+# Load environment variables
+load_dotenv()
+
+# Câu trả lời dùng các tool này không được cache:
+# phụ thuộc giờ hiện tại (không chỉ ngày) hoặc có tác dụng phụ (tạo/xóa sự kiện)
+UNCACHEABLE_TOOLS = {
+    'get_current_datetime',
+    'get_today_info',
+    'list_upcoming_events',
+    # Bỏ qua các khoảng trống đã trôi qua trong ngày
+    'find_free_slots',
+    'create_calendar_event',
+    'create_calendar_events_bulk',
+    'delete_calendar_event',
+    'delete_calendar_events_bulk',
+}
+# Kết quả tool bắt đầu bằng các chuỗi này là lỗi (có thể chỉ tạm thời)
+ERROR_PREFIXES = ('❌', 'Lỗi', 'Đã xảy ra lỗi', 'Error')
+
+class ResponseCache:
+    """
+    Cache câu trả lời của agent theo câu hỏi đã chuẩn hóa (bỏ dấu, chữ thường,
+    bỏ dấu câu) và một fingerprint ngữ cảnh (model, tools, ngày hiện tại,
+    người dùng...).
+
+    Khi ngữ cảnh đổi (sang ngày mới) fingerprint đổi nên entry cũ không bao
+    giờ được dùng; entry còn hết hạn sau ttl giây (ví dụ thời tiết) và bị
+    loại theo LRU khi vượt max_entries. Câu trả lời dựa trên dữ liệu lịch
+    lưu kèm phiên bản dữ liệu; chỉ những entry này mới kiểm tra lại phiên
+    bản (có thể phải đồng bộ lịch) khi được dùng.
+    """
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stale': 0, 'skipped': 0}
+
+    def key(self, prompt, fingerprint):
+        """Khóa cache từ câu hỏi và fingerprint (tuple hashable)."""
+        return normalize_key(prompt), fingerprint
+
+    def get(self, key, data_version=None):
+        """
+        Args:
+            key: Khóa từ key()
+            data_version (callable): Trả về phiên bản dữ liệu hiện tại; chỉ được
+                gọi khi entry được lưu kèm phiên bản dữ liệu
+
+        Returns:
+            str | None: Câu trả lời đã cache, hoặc None nếu chưa có/hết hạn/dữ liệu đã đổi
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() >= entry[1]:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+        output, _, stored_version = entry
+        if stored_version is not None:
+            # Ngoài lock: có thể phải đồng bộ dữ liệu (gọi API)
+            try:
+                current_version = data_version() if data_version is not None else None
+            except Exception:
+                current_version = None
+            if current_version != stored_version:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                    self._stats['stale'] += 1
+                    self._stats['misses'] += 1
+                return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        return output
+
+    def is_cacheable(self, intermediate_steps):
+        """Câu trả lời chỉ được cache khi không dùng tool không cache được và không có tool lỗi."""
+        for action, observation in intermediate_steps:
+            if action.tool in UNCACHEABLE_TOOLS:
+                return False
+            if isinstance(observation, str) and observation.startswith(ERROR_PREFIXES):
+                return False
+        return True
+
+    def put(self, key, output, intermediate_steps=(), data_version=None):
+        """
+        Lưu câu trả lời nếu cache được.
+
+        Args:
+            data_version: Phiên bản dữ liệu câu trả lời dựa vào (ví dụ dữ liệu
+                lịch trước khi agent chạy), None nếu không phụ thuộc dữ liệu nào
+
+        Returns:
+            bool: True nếu đã lưu
+        """
+        if not self.is_cacheable(intermediate_steps):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return False
+        with self._lock:
+            self._entries[key] = (output, time.time() + self.ttl, data_version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def stats(self):
+        """Trả về bộ đếm hit/miss của cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+    def clear(self):
+        """Xóa toàn bộ cache."""
+        with self._lock:
+            self._entries.clear()
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Helper function để lấy response cache dùng chung cho cả process.
+    Cấu hình qua RESPONSE_CACHE_SIZE và RESPONSE_CACHE_TTL (giây).
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '512')),
+                ttl=float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+            )
+        return _response_cache
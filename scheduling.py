@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+def merge_intervals(intervals):
+    """
+    Gộp các khoảng bận chồng lấn hoặc nối tiếp nhau.
+
+    Args:
+        intervals (list): Danh sách (start, end)
+
+    Returns:
+        list: Các khoảng (start, end) rời nhau, sắp xếp theo start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def free_slots(busy, window_start, window_end, min_duration=timedelta(minutes=30)):
+    """
+    Các khoảng trống trong [window_start, window_end) đủ dài ít nhất min_duration.
+
+    Args:
+        busy (list): Các khoảng bận (start, end), không cần sắp xếp/gộp trước
+        window_start (datetime): Đầu cửa sổ cần tìm
+        window_end (datetime): Cuối cửa sổ cần tìm
+        min_duration (timedelta): Độ dài tối thiểu của một khoảng trống
+
+    Returns:
+        list: Các khoảng trống (start, end)
+    """
+    slots = []
+    cursor = window_start
+    for start, end in merge_intervals(busy):
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start - cursor >= min_duration:
+            slots.append((cursor, start))
+        cursor = max(cursor, end)
+    if window_end - cursor >= min_duration:
+        slots.append((cursor, window_end))
+    return slots
+
+def is_busy(event):
+    """
+    Sự kiện có chiếm thời gian không: bỏ qua sự kiện "Rảnh" (transparent)
+    và sự kiện mà chính người dùng đã từ chối.
+    """
+    if event.get('transparency') == 'transparent':
+        return False
+    for attendee in event.get('attendees', []):
+        if attendee.get('self') and attendee.get('responseStatus') == 'declined':
+            return False
+    return True
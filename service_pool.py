@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class PoolTimeout(Exception):
+    """Không lấy được service nào trong thời gian cho phép (pool đã dùng hết)."""
+
+class ServicePool:
+    """
+    Pool có giới hạn các service object (ví dụ Google API client dựng trên
+    httplib2, vốn không thread-safe).
+
+    Mỗi service tại một thời điểm chỉ được một thread sử dụng: thread mượn
+    service bằng lease() và trả lại khi xong. Service rảnh được giữ lại để
+    dùng tiếp (không phải build lại), tối đa max_size service được tạo ra.
+    Thread đang giữ service mà gọi lease() lần nữa sẽ dùng lại chính service
+    đó, nên các lời gọi lồng nhau không thể tự làm cạn pool.
+
+    Ví dụ:
+        pool = ServicePool(lambda: build_calendar_service(creds), max_size=10)
+        with pool.lease() as service:
+            service.events().list(calendarId='primary').execute()
+    """
+
+    def __init__(self, factory, max_size=10, acquire_timeout=30.0):
+        self._factory = factory
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._in_use = 0
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'reentrant': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'peak_in_use': 0,
+        }
+
+    def _acquire(self, timeout):
+        """Lấy một service (chờ tối đa timeout giây nếu pool đã dùng hết)."""
+        if not self._slots.acquire(blocking=False):
+            started = time.perf_counter()
+            acquired = self._slots.acquire(timeout=timeout)
+            with self._lock:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += time.perf_counter() - started
+                if not acquired:
+                    self._stats['timeouts'] += 1
+            if not acquired:
+                raise PoolTimeout(
+                    f"Không có service rảnh sau {timeout}s (max_size={self.max_size})"
+                )
+        with self._lock:
+            service = self._idle.pop() if self._idle else None
+            generation = self._generation
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+        if service is None:
+            try:
+                service = self._factory()
+            except Exception:
+                self._release(None, generation)
+                raise
+            with self._lock:
+                self._stats['created'] += 1
+        return service, generation
+
+    def _release(self, service, generation):
+        with self._lock:
+            self._in_use -= 1
+            # Service tạo trước clear() (ví dụ credentials cũ) thì bỏ đi
+            if service is not None and generation == self._generation:
+                self._idle.append(service)
+        self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Mượn một service trong khối `with`, tự trả lại khi ra khỏi khối.
+
+        Args:
+            timeout (float, optional): Thời gian chờ tối đa, mặc định acquire_timeout
+
+        Raises:
+            PoolTimeout: Khi pool đã dùng hết và không có service được trả lại kịp
+        """
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            with self._lock:
+                self._stats['reentrant'] += 1
+            yield held[0]
+            return
+
+        service, generation = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        self._local.held = (service, generation)
+        try:
+            yield service
+        finally:
+            self._local.held = None
+            self._release(service, generation)
+
+    def clear(self):
+        """Bỏ mọi service đang rảnh; service đang được mượn sẽ bị bỏ khi trả lại."""
+        with self._lock:
+            self._idle.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Thống kê pool: số service đã tạo, đang dùng, rảnh, số lần phải chờ..."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['max_size'] = self.max_size
+            return stats
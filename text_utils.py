@@ -0,0 +1,31 @@
+import re
+import unicodedata
+
+def fold_diacritics(text: str) -> str:
+    """
+    Bỏ dấu tiếng Việt (và các dấu Unicode khác) khỏi chuỗi.
+    'đ'/'Đ' không tách được bằng NFKD nên được thay thủ công.
+
+    Args:
+        text (str): Chuỗi cần bỏ dấu
+
+    Returns:
+        str: Chuỗi không dấu, ví dụ "Hà Nội" -> "Ha Noi"
+    """
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def normalize_key(text: str) -> str:
+    """
+    Chuẩn hóa chuỗi để dùng làm khóa cache/tra cứu:
+    bỏ dấu, chữ thường, gộp khoảng trắng và dấu câu.
+
+    Args:
+        text (str): Chuỗi đầu vào (ví dụ tên thành phố)
+
+    Returns:
+        str: Khóa đã chuẩn hóa, ví dụ "  Hà   Nội, " -> "ha noi"
+    """
+    folded = fold_diacritics(text or '').casefold()
+    return re.sub(r'[\W_]+', ' ', folded).strip()
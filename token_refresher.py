@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import datetime
+from google.auth.transport.requests import Request
+
+class TokenRefresher:
+    """
+    Thread nền làm mới access token OAuth trước khi hết hạn `margin` giây.
+
+    Các service dùng chung một credentials object, nên khi token được làm mới
+    ở đây thì lời gọi API không bao giờ phải tự refresh (chặn request của
+    người dùng) trong trạng thái ổn định. Mỗi lần làm mới thành công gọi
+    on_refresh(creds), ví dụ để lưu token xuống đĩa.
+    """
+
+    def __init__(self, creds, margin=300, on_refresh=None, retry_delay=30, request_factory=Request):
+        self.creds = creds
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self._on_refresh = on_refresh
+        self._request_factory = request_factory
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'refreshes': 0, 'failures': 0, 'last_refresh': None, 'last_error': None}
+
+    def seconds_until_refresh(self):
+        """Số giây còn lại trước khi cần làm mới (<= 0 nghĩa là cần làm mới ngay)."""
+        if self.creds.expiry is None:
+            # Chưa có token thì làm mới ngay; token không có hạn thì không cần làm mới
+            return 0 if not self.creds.token and self.creds.refresh_token else float('inf')
+        # google-auth lưu expiry dạng datetime UTC không kèm tzinfo
+        remaining = (self.creds.expiry - datetime.utcnow()).total_seconds()
+        return remaining - self.margin
+
+    def refresh_now(self):
+        """Làm mới token ngay (thread-safe) và gọi on_refresh."""
+        with self._lock:
+            self.creds.refresh(self._request_factory())
+            self.stats['refreshes'] += 1
+            self.stats['last_refresh'] = time.time()
+            self.stats['last_error'] = None
+        if self._on_refresh is not None:
+            self._on_refresh(self.creds)
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.seconds_until_refresh()
+            if delay > 0:
+                # Token không có hạn (inf) thì kiểm tra lại định kỳ
+                self._stop.wait(min(delay, 3600))
+                continue
+            try:
+                self.refresh_now()
+            except Exception as error:
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(error)
+                # Token cũ vẫn dùng được tới khi hết hạn; thử lại sau
+                self._stop.wait(self.retry_delay)
+
+    def start(self):
+        """Khởi động thread nền (gọi nhiều lần vẫn chỉ có một thread)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
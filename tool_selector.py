@@ -0,0 +1,161 @@
+import re
+import threading
+from text_utils import normalize_key
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken đi kèm langchain-openai; thiếu thì ước lượng theo độ dài
+    tiktoken = None
+
+# Tool luôn được gắn: nhỏ và cần cho hầu hết câu hỏi có ngày tháng
+ALWAYS_TOOLS = ['get_current_datetime', 'get_today_info']
+
+# Nhóm tool -> tên tool
+TOOL_GROUPS = {
+    'weather': ['get_current_weather', 'get_weather_for_locations'],
+    'calendar': [
+        'list_upcoming_events',
+        'search_calendar_events',
+        'get_events_by_date',
+        'get_events_in_range',
+        'find_free_slots',
+        'get_tomorrow_events',
+        'get_today_events',
+    ],
+    'calendar_write': [
+        'create_calendar_event',
+        'create_calendar_events_bulk',
+        'delete_calendar_event',
+        'delete_calendar_events_bulk',
+    ],
+}
+
+# Từ khóa (đã bỏ dấu, chữ thường) của từng nhóm, tiếng Việt và tiếng Anh
+KEYWORDS = {
+    'weather': [
+        'thoi tiet', 'nhiet do', 'do am', 'mua', 'nang', 'nong', 'lanh', 'suong mu',
+        'weather', 'temperature', 'humidity', 'rain', 'sunny', 'wind', 'forecast', 'hot', 'cold',
+    ],
+    'calendar': [
+        'lich', 'su kien', 'hop', 'cuoc hop', 'hen', 'ranh', 'thoi gian trong',
+        'calendar', 'event', 'events', 'meeting', 'meetings', 'schedule', 'agenda',
+        'appointment', 'busy', 'free', 'available',
+    ],
+    'calendar_write': [
+        'tao', 'them', 'dat', 'len lich', 'xoa', 'huy', 'don',
+        'create', 'add', 'book', 'delete', 'remove', 'cancel', 'clear',
+    ],
+}
+
+# Nhóm chỉ được chọn khi câu hỏi cũng khớp nhóm khác
+# ("tạo" một mình không có nghĩa là tạo sự kiện)
+REQUIRES = {'calendar_write': 'calendar'}
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def estimate_tokens(text):
+    """
+    Số token của chuỗi theo tokenizer cl100k_base (tiktoken), hoặc ước lượng
+    khoảng 4 ký tự/token khi không có tiktoken.
+
+    Args:
+        text (str): Chuỗi cần đếm
+
+    Returns:
+        int: Số token
+    """
+    global _encoding
+    if tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.get_encoding('cl100k_base')
+                except Exception:
+                    # Không tải được bảng mã (offline): dùng ước lượng
+                    _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+class ToolSelector:
+    """
+    Chọn nhóm tool liên quan tới câu hỏi bằng cách chấm điểm từ khóa, để mỗi
+    lượt chỉ gắn schema của các tool đó (và phần system prompt tương ứng)
+    thay vì toàn bộ tools.
+
+    Câu hỏi không khớp nhóm nào, hoặc khớp tất cả, dùng đầy đủ tools như cũ.
+    """
+
+    def __init__(self):
+        self._patterns = {
+            group: [re.compile(r'\b' + re.escape(keyword) + r'\b') for keyword in keywords]
+            for group, keywords in KEYWORDS.items()
+        }
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'narrowed': 0, 'prompt_tokens': 0, 'tokens_saved': 0}
+
+    def scores(self, text):
+        """Số từ khóa khớp của từng nhóm trên câu hỏi đã chuẩn hóa."""
+        key = normalize_key(text)
+        return {
+            group: sum(1 for pattern in patterns if pattern.search(key))
+            for group, patterns in self._patterns.items()
+        }
+
+    def select(self, text, tool_names):
+        """
+        Chọn nhóm tool cho câu hỏi.
+
+        Args:
+            text (str): Câu hỏi của user
+            tool_names (iterable): Tên các tool agent đang có
+
+        Returns:
+            tuple | None: Tên các nhóm được chọn (đã sắp xếp), hoặc None nếu
+            cần dùng đầy đủ tools
+        """
+        available = set(tool_names)
+        groups = {
+            group for group, score in self.scores(text).items()
+            if score > 0 and set(TOOL_GROUPS[group]) <= available
+        }
+        groups = {group for group in groups if REQUIRES.get(group, group) in groups}
+        if not groups or set(selected_tool_names(groups)) >= available:
+            return None
+        return tuple(sorted(groups))
+
+    def record(self, full_tokens, prompt_tokens):
+        """Ghi nhận số token prompt + schema đã gửi so với khi gắn đầy đủ tools."""
+        with self._lock:
+            self._stats['requests'] += 1
+            if prompt_tokens < full_tokens:
+                self._stats['narrowed'] += 1
+            self._stats['prompt_tokens'] += prompt_tokens
+            self._stats['tokens_saved'] += full_tokens - prompt_tokens
+
+    def stats(self):
+        """Số câu hỏi, số câu được thu gọn tools và số token tiết kiệm (mỗi lần gọi LLM)."""
+        with self._lock:
+            stats = dict(self._stats)
+        full = stats['prompt_tokens'] + stats['tokens_saved']
+        stats['saved_rate'] = stats['tokens_saved'] / full if full else 0.0
+        return stats
+
+def selected_tool_names(groups):
+    """Tên các tool của các nhóm đã chọn, kèm ALWAYS_TOOLS."""
+    names = list(ALWAYS_TOOLS)
+    for group in sorted(groups):
+        names.extend(TOOL_GROUPS[group])
+    return names
+
+_tool_selector = None
+_tool_selector_lock = threading.Lock()
+
+def get_tool_selector():
+    """Helper function để lấy tool selector dùng chung cho cả process."""
+    global _tool_selector
+    with _tool_selector_lock:
+        if _tool_selector is None:
+            _tool_selector = ToolSelector()
+        return _tool_selector
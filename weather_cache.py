@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class WeatherCache:
+    """
+    Cache kết quả thời tiết hiện tại theo ô lưới (lat/lon làm tròn theo
+    độ phân giải của model, mặc định 0.1° ~ 11km).
+
+    Thời hạn của mỗi entry không cố định mà lấy từ block `current` của
+    Open-Meteo: dữ liệu quan trắc lúc `time` chỉ thay đổi sau `interval`
+    giây, nên entry được dùng lại cho tới thời điểm đó.
+    """
+
+    def __init__(self, grid_degrees=0.1, max_entries=512, min_ttl=60, default_ttl=900):
+        self.grid_degrees = grid_degrees
+        self.max_entries = max_entries
+        # TTL tối thiểu khi API vẫn trả về quan trắc đã quá hạn
+        self.min_ttl = min_ttl
+        # TTL dùng khi response không có time/interval
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+    def grid_key(self, lat, lon):
+        """Làm tròn tọa độ về ô lưới của model."""
+        return (round(lat / self.grid_degrees), round(lon / self.grid_degrees))
+
+    def expires_at(self, weather_data, now=None):
+        """
+        Tính thời điểm hết hạn (epoch giây) từ block `current`:
+        thời điểm quan trắc (giờ địa phương + utc_offset_seconds) cộng interval.
+        """
+        now = time.time() if now is None else now
+        current = weather_data.get("current") or {}
+        try:
+            observed = datetime.strptime(current["time"], "%Y-%m-%dT%H:%M")
+            observed_utc = observed.replace(tzinfo=timezone.utc).timestamp()
+            observed_utc -= weather_data.get("utc_offset_seconds", 0)
+            next_update = observed_utc + int(current["interval"])
+        except (KeyError, TypeError, ValueError):
+            return now + self.default_ttl
+        return max(next_update, now + self.min_ttl)
+
+    def get(self, lat, lon):
+        """
+        Lấy dữ liệu thời tiết đã cache cho ô lưới chứa (lat, lon).
+
+        Returns:
+            dict | None: Response Open-Meteo đã cache, hoặc None nếu chưa có/hết hạn
+        """
+        key = self.grid_key(lat, lon)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                weather_data, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return weather_data
+                del self._entries[key]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, lat, lon, weather_data):
+        """Lưu response Open-Meteo cho ô lưới chứa (lat, lon)."""
+        key = self.grid_key(lat, lon)
+        expires_at = self.expires_at(weather_data)
+        with self._lock:
+            self._entries[key] = (weather_data, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Trả về bộ đếm hit/miss của cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+    def clear(self):
+        """Xóa toàn bộ cache."""
+        with self._lock:
+            self._entries.clear()
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+def get_weather_cache():
+    """
+    Helper function để lấy weather cache dùng chung cho cả process.
+    Độ phân giải lưới cấu hình qua WEATHER_GRID_DEGREES.
+    """
+    global _weather_cache
+    with _weather_cache_lock:
+        if _weather_cache is None:
+            _weather_cache = WeatherCache(
+                grid_degrees=float(os.getenv('WEATHER_GRID_DEGREES', '0.1'))
+            )
+        return _weather_cache
@@ -1,5 +1,135 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from langchain.tools import tool
+from http_client import get_http_client
+from gazetteer import get_gazetteer
+from geocoding_cache import get_geocoding_cache
+from weather_cache import get_weather_cache
+
+GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+CURRENT_FIELDS = "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m"
+# Upper bound for the coordinates of one Open-Meteo request
+MAX_BATCH_LOCATIONS = 20
+
+# Weather code to description mapping (simplified)
+WEATHER_DESCRIPTIONS = {
+    0: "Trời quang đãng",
+    1: "Phần lớn quang đãng", 
+    2: "Có mây một phần",
+    3: "U ám",
+    45: "Sương mù",
+    48: "Sương mù đóng băng",
+    51: "Mưa phùn nhẹ",
+    53: "Mưa phùn vừa",
+    55: "Mưa phùn nặng",
+    61: "Mưa nhẹ",
+    63: "Mưa vừa",
+    65: "Mưa to",
+    80: "Mưa rào nhẹ",
+    81: "Mưa rào vừa",
+    82: "Mưa rào to"
+}
+
+def _geocode_location(location: str):
+    """
+    Resolve a location name to coordinates: geocoding cache first, then the
+    optional offline gazetteer, and the remote geocoder only as a fallback.
+    
+    Args:
+        location (str): The name of the city or location
+        
+    Returns:
+        dict | None: name, country, latitude, longitude - or None if not found
+    """
+    cache = get_geocoding_cache()
+    hit, place = cache.lookup(location)
+    if hit:
+        return place
+    
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        try:
+            place = gazetteer.lookup(location)
+        except (OSError, ValueError):
+            # A broken index must not break weather lookups
+            place = None
+        if place:
+            return place
+    
+    geocoding_params = {
+        "name": location,
+        "count": 1,
+        "language": "en",
+        "format": "json"
+    }
+    
+    # Raises on transient errors, so only healthy answers get cached
+    geocoding_data = get_http_client().get_json(GEOCODING_URL, params=geocoding_params, endpoint="geocoding")
+    
+    place = None
+    if geocoding_data.get("results"):
+        result = geocoding_data["results"][0]
+        place = {
+            "name": result["name"],
+            "country": result.get("country", ""),
+            "latitude": result["latitude"],
+            "longitude": result["longitude"]
+        }
+    
+    cache.store(location, place)
+    return place
+
+def _fetch_current_weather(lat: float, lon: float) -> dict:
+    """
+    Fetch the Open-Meteo forecast response for a coordinate, served from the
+    grid-cell weather cache until the current observation can have changed.
+    
+    Args:
+        lat (float): Latitude
+        lon (float): Longitude
+        
+    Returns:
+        dict: Open-Meteo forecast response containing the `current` block
+    """
+    return _fetch_current_weather_many([(lat, lon)])[0]
+
+def _fetch_current_weather_many(coordinates: list) -> list:
+    """
+    Fetch forecast responses for several coordinates, serving cached grid cells
+    locally and fetching the others in multi-coordinate requests of at most
+    MAX_BATCH_LOCATIONS coordinates each.
+    
+    Args:
+        coordinates (list): List of (lat, lon) tuples
+        
+    Returns:
+        list: Open-Meteo forecast responses, in the same order as coordinates
+    """
+    cache = get_weather_cache()
+    results = [cache.get(lat, lon) for lat, lon in coordinates]
+    missing = [i for i, weather_data in enumerate(results) if weather_data is None]
+    if not missing:
+        return results
+    
+    for start in range(0, len(missing), MAX_BATCH_LOCATIONS):
+        batch = missing[start:start + MAX_BATCH_LOCATIONS]
+        weather_params = {
+            "latitude": ",".join(str(coordinates[i][0]) for i in batch),
+            "longitude": ",".join(str(coordinates[i][1]) for i in batch),
+            "current": CURRENT_FIELDS,
+            "timezone": "auto"
+        }
+        
+        response_data = get_http_client().get_json(WEATHER_URL, params=weather_params, endpoint="forecast")
+        # Open-Meteo returns a list for several coordinates, a single object for one
+        if isinstance(response_data, dict):
+            response_data = [response_data]
+        
+        for i, weather_data in zip(batch, response_data):
+            cache.put(coordinates[i][0], coordinates[i][1], weather_data)
+            results[i] = weather_data
+    return results
 
 @tool
 def get_current_weather(location: str) -> str:
@@ -14,38 +144,20 @@ def get_current_weather(location: str) -> str:
     """
     try:
         # Using Open-Meteo API (free weather API)
-        # First, get coordinates for the location using their geocoding API
-        geocoding_url = "https://geocoding-api.open-meteo.com/v1/search"
-        geocoding_params = {
-            "name": location,
-            "count": 1,
-            "language": "en",
-            "format": "json"
-        }
-        
-        geocoding_response = requests.get(geocoding_url, params=geocoding_params)
-        geocoding_data = geocoding_response.json()
+        # First, get coordinates for the location (cached geocoding)
+        place = _geocode_location(location)
         
-        if not geocoding_data.get("results"):
+        if not place:
             return f"Không thể tìm thấy thông tin về địa điểm: {location}"
         
         # Get latitude and longitude
-        lat = geocoding_data["results"][0]["latitude"]
-        lon = geocoding_data["results"][0]["longitude"]
-        city_name = geocoding_data["results"][0]["name"]
-        country = geocoding_data["results"][0].get("country", "")
+        lat = place["latitude"]
+        lon = place["longitude"]
+        city_name = place["name"]
+        country = place["country"]
         
-        # Get weather data
-        weather_url = "https://api.open-meteo.com/v1/forecast"
-        weather_params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m",
-            "timezone": "auto"
-        }
-        
-        weather_response = requests.get(weather_url, params=weather_params)
-        weather_data = weather_response.json()
+        # Get weather data (cached per grid cell)
+        weather_data = _fetch_current_weather(lat, lon)
         
         current = weather_data["current"]
         temperature = current["temperature_2m"]
@@ -53,26 +165,7 @@ def get_current_weather(location: str) -> str:
         wind_speed = current["wind_speed_10m"]
         weather_code = current["weather_code"]
         
-        # Weather code to description mapping (simplified)
-        weather_descriptions = {
-            0: "Trời quang đãng",
-            1: "Phần lớn quang đãng", 
-            2: "Có mây một phần",
-            3: "U ám",
-            45: "Sương mù",
-            48: "Sương mù đóng băng",
-            51: "Mưa phùn nhẹ",
-            53: "Mưa phùn vừa",
-            55: "Mưa phùn nặng",
-            61: "Mưa nhẹ",
-            63: "Mưa vừa",
-            65: "Mưa to",
-            80: "Mưa rào nhẹ",
-            81: "Mưa rào vừa",
-            82: "Mưa rào to"
-        }
-        
-        weather_desc = weather_descriptions.get(weather_code, "Không xác định")
+        weather_desc = WEATHER_DESCRIPTIONS.get(weather_code, "Không xác định")
         
         result = f"""
 🌍 Thời tiết hiện tại tại {city_name}, {country}:
@@ -86,3 +179,52 @@ def get_current_weather(location: str) -> str:
         
     except Exception as e:
         return f"Lỗi khi lấy thông tin thời tiết: {str(e)}"
+
+
+@tool
+def get_weather_for_locations(locations: List[str]) -> str:
+    """
+    Get current weather for several locations at once.
+    Use this instead of calling get_current_weather repeatedly when the user
+    asks about more than one city (e.g. "weather in Hanoi, Da Nang and Saigon").
+    
+    Args:
+        locations (List[str]): Names of the cities or locations
+        
+    Returns:
+        str: One compact line of current weather per location
+    """
+    try:
+        # Drop duplicates while keeping the user's order
+        names = list(dict.fromkeys(name.strip() for name in locations if name and name.strip()))
+        if not names:
+            return "Vui lòng cung cấp ít nhất một địa điểm."
+        
+        # Geocode all locations concurrently (cache hits return immediately)
+        with ThreadPoolExecutor(max_workers=min(8, len(names))) as executor:
+            places = list(executor.map(_geocode_location, names))
+        
+        found = [(name, place) for name, place in zip(names, places) if place]
+        not_found = [name for name, place in zip(names, places) if not place]
+        
+        lines = ["🌍 Thời tiết hiện tại:"]
+        if found:
+            weather_list = _fetch_current_weather_many(
+                [(place["latitude"], place["longitude"]) for _, place in found]
+            )
+            for (name, place), weather_data in zip(found, weather_list):
+                current = weather_data["current"]
+                weather_desc = WEATHER_DESCRIPTIONS.get(current["weather_code"], "Không xác định")
+                lines.append(
+                    f"- {place['name']}, {place['country']}: 🌡️ {current['temperature_2m']}°C, "
+                    f"💧 {current['relative_humidity_2m']}%, 💨 {current['wind_speed_10m']} km/h, "
+                    f"☁️ {weather_desc}"
+                )
+        
+        for name in not_found:
+            lines.append(f"- {name}: Không thể tìm thấy thông tin về địa điểm này")
+        
+        return "\n".join(lines)
+        
+    except Exception as e:
+        return f"Lỗi khi lấy thông tin thời tiết: {str(e)}"